@@ -0,0 +1,100 @@
+"""Test cases of the ocean session pool"""
+import threading
+from types import SimpleNamespace
+import pytest
+from extraction_utils.utils.ocean_pool import OceanPool, StubOceanSession, get_pool
+
+KIT = SimpleNamespace(root='/kits/pdk', name='pdk', tech_id='1278')
+OTHER_KIT = SimpleNamespace(root='/kits/other', name='other', tech_id='1278')
+
+
+class RecordingSession(StubOceanSession):
+    """Stub session remembering every session started"""
+
+    started = []
+
+    def __init__(self, kit=None, session_dir=None, handler=None):
+        super().__init__(kit, session_dir, handler)
+        RecordingSession.started.append(self)
+
+
+@pytest.fixture(name='stub_pool')
+def fixture_stub_pool():
+    """Returns a factory of stub pools recording the sessions they start"""
+    RecordingSession.started = []
+    pools = []
+
+    def create(size=1, handler=None):
+        pool = OceanPool(size, 'stub', handler=handler)
+        pool.session_class = RecordingSession
+        pools.append(pool)
+        return pool
+
+    yield create
+    for pool in pools:
+        pool.close()
+
+
+def test_ocean_pool_reuses_sessions(stub_pool):
+    """Replays of a kit run in one warm session, other kits get their own"""
+    pool = stub_pool()
+    assert pool.replay(KIT, 'run_prelay.ocn') == (0, '')
+    assert pool.replay(KIT, 'run_polo.ocn') == (0, '')
+    assert len(RecordingSession.started) == 1
+    assert RecordingSession.started[0].replays == ['run_prelay.ocn', 'run_polo.ocn']
+    pool.replay(OTHER_KIT, 'run_oa.ocn')
+    assert len(RecordingSession.started) == 2
+    assert RecordingSession.started[1].kit is OTHER_KIT
+
+
+def test_ocean_pool_size_limit(stub_pool):
+    """A replay waits for an idle session once size sessions of the kit exist"""
+    release = threading.Event()
+    running = threading.Semaphore(0)
+
+    def handler(script):
+        running.release()
+        release.wait(timeout=10)
+        return 0, script
+
+    pool = stub_pool(size=2, handler=handler)
+    results = []
+    threads = [threading.Thread(target=lambda idx=idx: results.append(pool.replay(KIT, f'run_{idx}.ocn')))
+               for idx in range(3)]
+    for thread in threads:
+        thread.start()
+    for _ in range(2):
+        assert running.acquire(timeout=10)
+    assert not running.acquire(timeout=0.2)
+    assert len(RecordingSession.started) == 2
+    release.set()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert sorted(results) == [(0, f'run_{idx}.ocn') for idx in range(3)]
+    assert len(RecordingSession.started) == 2
+
+
+def test_ocean_pool_discards_failed_session(stub_pool):
+    """A session failing a replay is closed and replaced by a new one"""
+    def handler(script):
+        if script == 'broken.ocn':
+            raise Exception("Ocean session exited")
+        return 0, ''
+
+    pool = stub_pool(handler=handler)
+    with pytest.raises(Exception, match="Ocean session exited"):
+        pool.replay(KIT, 'broken.ocn')
+    failed = RecordingSession.started[0]
+    assert not failed.alive
+    assert pool.replay(KIT, 'run_polo.ocn') == (0, '')
+    assert len(RecordingSession.started) == 2
+    assert RecordingSession.started[1].replays == ['run_polo.ocn']
+
+
+def test_get_pool_per_size():
+    """Callers asking for another pool size get a pool of that size"""
+    small = get_pool(1, 'stub')
+    large = get_pool(2, 'stub')
+    assert small is not large
+    assert (small.size, large.size) == (1, 2)
+    assert get_pool(2, 'stub') is large
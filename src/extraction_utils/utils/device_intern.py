@@ -0,0 +1,108 @@
+"""Module to share repeated property sets between parsed devices"""
+from collections.abc import Mapping
+from .device_match import KEY_PROPS, OA_KEY_PROPS
+
+UNIQUE_PROPS = frozenset(('PROPERTY',) + KEY_PROPS + OA_KEY_PROPS)
+
+
+class DeviceSchema:
+    """Property layout shared by the devices of a model, names the device
+    specific properties (name and placement) and the shared ones, and the
+    compared properties of each in sorted order"""
+
+    __slots__ = ('keys', 'own_keys', 'shared_keys', 'slots', 'own_compared', 'shared_compared',
+                 'fingerprints')
+
+    def __init__(self, keys: tuple, exclude=frozenset()):
+        self.keys = keys
+        self.own_keys = tuple(key for key in keys if key in UNIQUE_PROPS)
+        self.shared_keys = tuple(key for key in keys if key not in UNIQUE_PROPS)
+        self.slots = {key: (True, idx) for idx, key in enumerate(self.own_keys)}
+        self.slots.update((key, (False, idx)) for idx, key in enumerate(self.shared_keys))
+        self.own_compared = sorted((key, idx) for idx, key in enumerate(self.own_keys)
+                                   if key not in exclude)
+        self.shared_compared = sorted((key, idx) for idx, key in enumerate(self.shared_keys)
+                                      if key not in exclude)
+        self.fingerprints = {}
+
+    def fingerprint(self, own: tuple, shared: tuple) -> int:
+        """Returns the hash of the compared properties of a device, independent
+        of the property order. The hash of the shared values is computed once
+        per property set"""
+        shared_hash = self.fingerprints.get(shared)
+        if shared_hash is None:
+            shared_hash = self.fingerprints[shared] = \
+                hash(tuple((key, shared[idx]) for key, idx in self.shared_compared))
+        return hash((shared_hash,) + tuple((key, own[idx]) for key, idx in self.own_compared))
+
+
+class FlyweightDevice(Mapping):
+    """Read only device mapping holding its name and placement values, the
+    schema and the tuple of remaining property values are shared with every
+    device of the same configuration. fingerprint hashes the compared
+    properties, devices of one interner with equal compared properties have
+    equal fingerprints whatever their property order"""
+
+    __slots__ = ('schema', 'own', 'shared', 'fingerprint')
+
+    def __init__(self, schema: DeviceSchema, own: tuple, shared: tuple):
+        self.schema = schema
+        self.own = own
+        self.shared = shared
+        self.fingerprint = schema.fingerprint(own, shared)
+
+    def __getitem__(self, key):
+        is_own, idx = self.schema.slots[key]
+        return self.own[idx] if is_own else self.shared[idx]
+
+    def get(self, key, default=None):
+        slot = self.schema.slots.get(key)
+        if slot is None:
+            return default
+        return self.own[slot[1]] if slot[0] else self.shared[slot[1]]
+
+    def __contains__(self, key):
+        return key in self.schema.slots
+
+    def __iter__(self):
+        return iter(self.schema.keys)
+
+    def __len__(self):
+        return len(self.schema.keys)
+
+    def items(self):
+        return [(key, self[key]) for key in self.schema.keys]
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self.items())!r})'
+
+
+class DeviceInterner:
+    """Flyweight factory turning device dicts into FlyweightDevices. Memory
+    grows with the number of distinct property configurations instead of the
+    number of devices"""
+
+    def __init__(self, exclude=()):
+        """
+        Args
+        -----
+        properties left out of the device fingerprints, PROPERTY always is
+        """
+        self.exclude = frozenset(exclude) | {"PROPERTY"}
+        self.schemas = {}
+        self.values = {}
+
+    def intern(self, dev) -> FlyweightDevice:
+        """Returns the flyweight device of a device dict"""
+        keys = tuple(dev)
+        schema = self.schemas.get(keys)
+        if schema is None:
+            schema = self.schemas[keys] = DeviceSchema(keys, self.exclude)
+        shared = tuple(dev[key] for key in schema.shared_keys)
+        shared = self.values.setdefault(shared, shared)
+        return FlyweightDevice(schema, tuple(dev[key] for key in schema.own_keys), shared)
+
+    def intern_all(self, devices):
+        """Generator interning every device of a device stream"""
+        for dev in devices:
+            yield self.intern(dev)
@@ -0,0 +1,187 @@
+"""Module to match devices of two netlists on their placement"""
+import logging
+import math
+from collections import OrderedDict, deque
+from itertools import product
+from .spice_units import parse_spice_number
+
+KEY_PROPS = ('x', 'y', 'angle')
+OA_KEY_PROPS = ('llx', 'lly')
+UNPLACED_KEY_PROPS = ('device_type', 'num_of_ports')
+
+
+def device_key(dev: dict, key_props: tuple = KEY_PROPS) -> tuple:
+    """Returns the placement key of a parsed device"""
+    return tuple(dev.get(prop) for prop in key_props)
+
+
+def placement_sort_key(dev: dict, key_props: tuple = KEY_PROPS) -> tuple:
+    """Returns the placement key of a parsed device in a sortable form, missing
+    properties sort before present ones"""
+    return tuple((value is not None, value or '')
+                 for value in (dev.get(prop) for prop in key_props))
+
+
+class DeviceMatcher:
+    """Hash index of sample devices keyed on placement, used to find the
+    matching sample device of every golden device in linear time"""
+
+    def __init__(self, cur_devices, key_props: tuple = KEY_PROPS):
+        """Builds the index over sample devices
+
+        Args
+        -----
+        cur_devices: iterable of device dicts from the sample netlist
+        key_props: device properties forming the placement key
+        """
+        self.key_props = key_props
+        self.index = OrderedDict()
+        self.num_cur = 0
+        for cur_dev in cur_devices:
+            self.index.setdefault(device_key(cur_dev, key_props), []).append(cur_dev)
+            self.num_cur += 1
+        self.num_ref = 0
+        self.duplicates = OrderedDict()
+        self.unmatched_ref = []
+        self._ref_seen = {}
+        for key, devs in self.index.items():
+            if len(devs) > 1:
+                self.duplicates[key] = [0, len(devs)]
+
+    def match(self, ref_devices):
+        """Generator pairing golden devices with sample devices
+
+        Args
+        -----
+        ref_devices: iterable of device dicts from the golden netlist
+
+        Returns
+        -------
+        yields (ref_dev, cur_dev) tuples, cur_dev is None when no sample device
+        is placed at the golden device position. Devices sharing a position are
+        paired in netlist order and recorded in duplicates
+        """
+        ref_seen = self._ref_seen
+        for ref_dev in ref_devices:
+            self.num_ref += 1
+            key = device_key(ref_dev, self.key_props)
+            ref_seen[key] = ref_seen.get(key, 0) + 1
+            if ref_seen[key] > 1:
+                self.duplicates.setdefault(key, [0, len(self.index.get(key, ()))])
+            if key in self.duplicates:
+                self.duplicates[key][0] = ref_seen[key]
+            cur_devs = self.index.get(key, ())
+            if ref_seen[key] <= len(cur_devs):
+                yield ref_dev, cur_devs[ref_seen[key] - 1]
+            else:
+                self.unmatched_ref.append(ref_dev)
+                yield ref_dev, None
+        if self.duplicates:
+            logging.warning("%d position(s) are shared by more than one device",
+                            len(self.duplicates))
+
+    def unmatched_cur(self) -> list:
+        """Returns sample devices that were not paired with any golden device"""
+        return [cur_dev for key, cur_devs in self.index.items()
+                for cur_dev in cur_devs[self._ref_seen.get(key, 0):]]
+
+
+class SpatialIndex:
+    """Grid bucketed index of devices on their numeric placement. Coordinates
+    are compared after SPICE suffix conversion, so 1.0u matches 1u, and within
+    an optional tolerance. Devices lacking a coordinate, such as djnw diodes,
+    are paired in netlist order on their device type, number of ports and
+    present coordinates instead"""
+
+    def __init__(self, devices, key_props: tuple = OA_KEY_PROPS, tolerance: float = 0.0):
+        """Builds the index over devices
+
+        Args
+        -----
+        devices: iterable of device dicts
+        key_props: device properties holding the placement coordinates
+        tolerance: largest per coordinate difference accepted as the same place
+        """
+        self.key_props = key_props
+        self.tolerance = float(tolerance or 0.0)
+        self.buckets = {}
+        self.exact = {}
+        self.unplaced = {}
+        self.entries = []
+        for dev in devices:
+            values = device_key(dev, key_props)
+            if None in values:
+                entry = [None, dev, False]
+                self.entries.append(entry)
+                self.unplaced.setdefault(self._unplaced_key(dev, values), deque()).append(entry)
+                continue
+            point = self._point(values)
+            entry = [point, dev, False]
+            self.entries.append(entry)
+            if None in point:
+                self.exact.setdefault(values, []).append(entry)
+            else:
+                self.buckets.setdefault(self._cell(point), []).append(entry)
+
+    @staticmethod
+    def _point(values: tuple) -> tuple:
+        """Converts coordinate strings to floats rounded to 12 significant
+        digits, so that 1000n and 1u land on the same point"""
+        point = []
+        for value in values:
+            coord = parse_spice_number(value)
+            point.append(None if coord is None else float(f'{coord:.12g}'))
+        return tuple(point)
+
+    @staticmethod
+    def _unplaced_key(dev: dict, values: tuple) -> tuple:
+        return device_key(dev, UNPLACED_KEY_PROPS) + values
+
+    def _cell(self, point: tuple) -> tuple:
+        if not self.tolerance:
+            return point
+        return tuple(math.floor(coord / self.tolerance) for coord in point)
+
+    def query(self, dev: dict):
+        """Returns the closest unmatched device placed at dev position and marks
+        it matched, None if there is no such device. For a device lacking a
+        coordinate the first unmatched unplaced device of its kind is returned"""
+        values = device_key(dev, self.key_props)
+        if None in values:
+            candidates = self.unplaced.get(self._unplaced_key(dev, values))
+            if not candidates:
+                return None
+            entry = candidates.popleft()
+            entry[2] = True
+            return entry[1]
+        point = self._point(values)
+        if None in point:
+            candidates = self.exact.get(values, ())
+        elif not self.tolerance:
+            candidates = self.buckets.get(point, ())
+        else:
+            cell = self._cell(point)
+            candidates = [entry for offset in product((-1, 0, 1), repeat=len(cell))
+                          for entry in self.buckets.get(tuple(c + o for c, o in zip(cell, offset)),
+                                                        ())]
+        best = None
+        best_dist = None
+        for entry in candidates:
+            if entry[2]:
+                continue
+            if None in point:
+                dist = 0.0
+            else:
+                dist = max(abs(a - b) for a, b in zip(point, entry[0]))
+                if dist > self.tolerance:
+                    continue
+            if best is None or dist < best_dist:
+                best, best_dist = entry, dist
+        if best is None:
+            return None
+        best[2] = True
+        return best[1]
+
+    def remaining(self) -> list:
+        """Returns indexed devices that were not returned by any query"""
+        return [entry[1] for entry in self.entries if not entry[2]]
@@ -0,0 +1,305 @@
+"""Module to hold parsed devices in a compact columnar table"""
+import json
+import os
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .device_match import KEY_PROPS
+from .spice_units import spice_floats
+from .spf_parser import iter_spf_devices, iter_devices, find_instance_offset, \
+    split_byte_ranges, parse_byte_range_lines, PARALLEL_MIN_BYTES, CHUNKS_PER_WORKER
+
+MISSING = -1
+
+
+class StringPool:
+    """Interns property values to integer codes. Tables sharing a pool can be
+    compared by code equality instead of string equality"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value: str) -> int:
+        """Returns the code of value, interning it on first use"""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+    def as_floats(self) -> np.ndarray:
+        """Returns pool values converted to float with SPICE scale suffixes
+        applied, NaN for non numeric values. Values interned since the last
+        call are the only ones converted"""
+        floats = getattr(self, '_floats', None)
+        if floats is None:
+            floats = np.empty(0)
+        if len(floats) < len(self.values):
+            floats = self._floats = np.concatenate(
+                (floats, spice_floats(self.values[len(floats):])))
+        return floats
+
+
+class DeviceTable:
+    """Parsed devices stored column wise. Every property has a column of value
+    codes into the string pool, MISSING where the device lacks the property"""
+
+    def __init__(self, pool: StringPool = None):
+        self.pool = pool if pool is not None else StringPool()
+        self.prop_codes = OrderedDict()
+        self.names = []
+        self._columns = []
+        self.frozen = False
+
+    @classmethod
+    def from_devices(cls, devices, pool: StringPool = None):
+        """Builds a frozen table from an iterable of device dicts"""
+        table = cls(pool)
+        for dev in devices:
+            table.append(dev)
+        table.freeze()
+        return table
+
+    @classmethod
+    def from_spf(cls, spf_file, pool: StringPool = None, workers: int = 1):
+        """Builds a frozen table from the instance section of an spf file. With
+        more than one worker, line aligned byte ranges of the instance section
+        are parsed to tables in a process pool and merged in file order"""
+        start = find_instance_offset(spf_file)
+        end = os.path.getsize(spf_file)
+        if workers <= 1 or start is None or end - start < PARALLEL_MIN_BYTES:
+            return cls.from_devices(iter_spf_devices(spf_file), pool)
+        ranges = split_byte_ranges(spf_file, start, end, workers * CHUNKS_PER_WORKER)
+        table = cls(pool)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk in executor.map(_parse_byte_range_table, [spf_file] * len(ranges),
+                                      [rng[0] for rng in ranges], [rng[1] for rng in ranges]):
+                table.extend(chunk)
+        table.freeze()
+        return table
+
+    def __len__(self):
+        return len(self.names)
+
+    def save(self, file):
+        """Writes the frozen table to an npz file, names, properties and pool
+        values are stored as json and the columns as integer arrays, so the file
+        can be loaded without unpickling"""
+        self.freeze()
+        meta = json.dumps({'names': self.names, 'props': list(self.prop_codes),
+                           'values': self.pool.values}).encode('utf8')
+        np.savez(file, meta=np.frombuffer(meta, dtype=np.uint8),
+                 **{f'column{idx}': column for idx, column in enumerate(self._columns)})
+
+    @classmethod
+    def load(cls, file):
+        """Returns the frozen table of an npz file written by save, with its own
+        string pool"""
+        with np.load(file, allow_pickle=False) as data:
+            meta = json.loads(data['meta'].tobytes().decode('utf8'))
+            table = cls(StringPool())
+            table.pool.values = meta['values']
+            table.pool.codes = {value: code for code, value in enumerate(meta['values'])}
+            table.names = meta['names']
+            table.prop_codes = OrderedDict((prop, idx) for idx, prop in enumerate(meta['props']))
+            table._columns = [data[f'column{idx}'].astype(np.intc) for idx in range(len(meta['props']))]
+        table.frozen = True
+        return table
+
+    def append(self, dev: dict):
+        """Adds a device dict as the next row of the table"""
+        if self.frozen:
+            raise Exception("Device table is frozen, devices can not be added")
+        row = len(self.names)
+        self.names.append(dev.get("PROPERTY"))
+        seen = 0
+        for prop, value in dev.items():
+            if prop == "PROPERTY":
+                continue
+            prop_code = self.prop_codes.get(prop)
+            if prop_code is None:
+                prop_code = self.prop_codes[prop] = len(self._columns)
+                self._columns.append(array('i', [MISSING]) * row)
+            self._columns[prop_code].append(self.pool.code(value))
+            seen += 1
+        if seen != len(self._columns):
+            for column in self._columns:
+                if len(column) == row:
+                    column.append(MISSING)
+
+    def extend(self, other):
+        """Appends the rows of a frozen table built on another string pool"""
+        if self.frozen:
+            raise Exception("Device table is frozen, devices can not be added")
+        row = len(self.names)
+        remap = np.array([self.pool.code(value) for value in other.pool.values] + [MISSING],
+                         dtype=np.intc)
+        for prop, other_code in other.prop_codes.items():
+            prop_code = self.prop_codes.get(prop)
+            if prop_code is None:
+                prop_code = self.prop_codes[prop] = len(self._columns)
+                self._columns.append(array('i', [MISSING]) * row)
+            self._columns[prop_code].frombytes(remap[other.column(prop)].tobytes())
+        self.names.extend(other.names)
+        for column in self._columns:
+            if len(column) == row:
+                column.extend(array('i', [MISSING]) * len(other))
+
+    def freeze(self):
+        """Converts the columns to numpy arrays, no devices can be added later"""
+        if not self.frozen:
+            self._columns = [np.frombuffer(column, dtype=np.intc) for column in self._columns]
+            self.frozen = True
+
+    def column(self, prop: str) -> np.ndarray:
+        """Returns value codes of a property, all MISSING for unknown properties"""
+        prop_code = self.prop_codes.get(prop)
+        if prop_code is None:
+            return np.full(len(self.names), MISSING, dtype=np.intc)
+        return np.asarray(self._columns[prop_code])
+
+    def placement_codes(self, key_props: tuple = KEY_PROPS) -> np.ndarray:
+        """Returns an (n, len(key_props)) array of placement value codes"""
+        return np.stack([self.column(prop) for prop in key_props], axis=1)
+
+    def fingerprints(self, props) -> np.ndarray:
+        """Returns a uint64 hash per row of the value codes of props, rows with
+        equal codes have equal fingerprints. props has to be in the same order
+        for tables compared with each other"""
+        fingerprint = np.zeros(len(self.names), dtype=np.uint64)
+        for salt, prop in enumerate(props):
+            codes = self.column(prop).astype(np.int64).view(np.uint64)
+            fingerprint = _mix(fingerprint ^ _mix(codes + np.uint64(salt << 32)))
+        return fingerprint
+
+    def device(self, row: int) -> dict:
+        """Returns the device dict of a row"""
+        dev = {"PROPERTY": self.names[row]}
+        for prop, prop_code in self.prop_codes.items():
+            code = self._columns[prop_code][row]
+            if code != MISSING:
+                dev[prop] = self.pool[code]
+        return dev
+
+    def __iter__(self):
+        values = self.pool.values
+        columns = [(prop, np.asarray(self._columns[prop_code]).tolist())
+                   for prop, prop_code in self.prop_codes.items()]
+        for row, name in enumerate(self.names):
+            dev = {"PROPERTY": name}
+            for prop, column in columns:
+                code = column[row]
+                if code != MISSING:
+                    dev[prop] = values[code]
+            yield dev
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer applied element wise to a uint64 array"""
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _parse_byte_range_table(spf_file, start: int, end: int) -> DeviceTable:
+    """Parses a line aligned byte range of an spf file to a device table"""
+    return DeviceTable.from_devices(iter_devices(parse_byte_range_lines(spf_file, start, end)))
+
+
+def _occurrence_rank(groups: np.ndarray) -> np.ndarray:
+    """Returns the running occurrence count of every entry within its group"""
+    order = np.argsort(groups, kind='stable')
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    ranks = np.arange(len(groups)) - np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+    rank = np.empty(len(groups), dtype=np.int64)
+    rank[order] = ranks
+    return rank
+
+
+def match_tables(ref: DeviceTable, cur: DeviceTable, key_props: tuple = KEY_PROPS) -> tuple:
+    """
+    Args
+    -----
+    golden and sample device tables sharing one string pool
+
+    Returns
+    -------
+    matched golden rows, matched sample rows, unmatched golden rows,
+    unmatched sample rows and a dict of placements shared by more than one
+    device mapped to (golden count, sample count), in DeviceMatcher order.
+    Devices sharing a placement are paired in netlist order
+    """
+    if ref.pool is not cur.pool:
+        raise Exception("Device tables must share a string pool to be matched")
+    num_ref = len(ref)
+    keys = np.concatenate([ref.placement_codes(key_props), cur.placement_codes(key_props)])
+    if not len(keys):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty, {}
+    uniq, groups = np.unique(keys, axis=0, return_inverse=True)
+    groups = groups.reshape(-1).astype(np.int64)
+    ref_groups, cur_groups = groups[:num_ref], groups[num_ref:]
+    ref_rank, cur_rank = _occurrence_rank(ref_groups), _occurrence_rank(cur_groups)
+    width = int(max(ref_rank.max(initial=0), cur_rank.max(initial=0))) + 1
+    _, ref_idx, cur_idx = np.intersect1d(ref_groups * width + ref_rank,
+                                         cur_groups * width + cur_rank,
+                                         assume_unique=True, return_indices=True)
+    order = np.argsort(ref_idx)
+    ref_idx, cur_idx = ref_idx[order], cur_idx[order]
+    unmatched_ref = np.setdiff1d(np.arange(num_ref), ref_idx)
+    unmatched_cur = np.setdiff1d(np.arange(len(cur)), cur_idx)
+    ref_counts = np.bincount(ref_groups, minlength=len(uniq))
+    cur_counts = np.bincount(cur_groups, minlength=len(uniq))
+    # duplicates in DeviceMatcher order: sample duplicates by their first sample
+    # row, then golden only duplicates by their second golden row
+    first_cur = np.full(len(uniq), len(cur), dtype=np.int64)
+    np.minimum.at(first_cur, cur_groups, np.arange(len(cur)))
+    second_ref = np.full(len(uniq), num_ref, dtype=np.int64)
+    second_ref[ref_groups[ref_rank == 1]] = np.flatnonzero(ref_rank == 1)
+    dup_groups = np.flatnonzero((ref_counts > 1) | (cur_counts > 1))
+    sample_dup = cur_counts[dup_groups] > 1
+    dup_groups = dup_groups[np.lexsort((np.where(sample_dup, first_cur[dup_groups], second_ref[dup_groups]),
+                                        ~sample_dup))]
+    duplicates = {tuple(ref.pool[code] if code != MISSING else None for code in uniq[group]):
+                  (int(ref_counts[group]), int(cur_counts[group]))
+                  for group in dup_groups}
+    return ref_idx, cur_idx, unmatched_ref, unmatched_cur, duplicates
+
+
+def compare_tables(ref: DeviceTable, cur: DeviceTable, ref_idx: np.ndarray,
+                   cur_idx: np.ndarray, exclude_list=(), comparator=None) -> np.ndarray:
+    """
+    Args
+    -----
+    golden and sample device tables sharing one string pool, matched row
+    pairs, the properties to ignore and an optional PropertyComparator
+
+    Returns
+    -------
+    boolean array, True for pairs whose golden properties all match the sample.
+    Values are compared by code without a comparator, as numbers within the
+    property tolerances with one
+    """
+    pair_match = np.ones(len(ref_idx), dtype=bool)
+    floats = ref.pool.as_floats() if comparator is not None else None
+    for prop in ref.prop_codes:
+        if prop in exclude_list:
+            continue
+        ref_codes = ref.column(prop)[ref_idx]
+        cur_codes = cur.column(prop)[cur_idx]
+        if comparator is None:
+            prop_match = ref_codes == cur_codes
+        else:
+            prop_match = comparator.compare_codes(prop, ref_codes, cur_codes, floats)
+        pair_match &= (ref_codes == MISSING) | prop_match
+    return pair_match
@@ -0,0 +1,125 @@
+"""Module to sort and join record streams larger than memory through run files"""
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+
+RECORD_OVERHEAD = 128
+MAX_MERGE_RUNS = 64
+
+
+class ExternalSorter:
+    """Collects (key, record) pairs within a memory budget. Full buffers are
+    sorted and spilled to run files, iteration merges the runs and yields the
+    records in key order, merging at most MAX_MERGE_RUNS run files at once.
+    Keys have to be unique and comparable"""
+
+    def __init__(self, max_bytes: int, tmp_dir=None):
+        """
+        Args
+        -----
+        max_bytes: approximate memory used by buffered records before a spill
+        tmp_dir: directory receiving the run files, system temp dir by default
+        """
+        self.max_bytes = max(1, int(max_bytes))
+        if tmp_dir:
+            os.makedirs(tmp_dir, exist_ok=True)
+        self.tmp_dir = tempfile.mkdtemp(prefix='isotope_runs_', dir=tmp_dir)
+        self.runs = []
+        self._buffer = []
+        self._size = 0
+        self._count = 0
+        self._num_runs = 0
+
+    def add(self, key, record):
+        """Adds a record, spilling the buffer to a run file when it is full"""
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        self._buffer.append((key, payload))
+        self._size += len(payload) + RECORD_OVERHEAD
+        self._count += 1
+        if self._size >= self.max_bytes:
+            self._spill()
+
+    def _spill(self):
+        self._buffer.sort(key=itemgetter(0))
+        self.runs.append(self._write_run(self._buffer))
+        self._buffer = []
+        self._size = 0
+
+    def _write_run(self, items) -> str:
+        run_file = os.path.join(self.tmp_dir, f'run{self._num_runs}.pkl')
+        self._num_runs += 1
+        with open(run_file, 'wb') as file:
+            for item in items:
+                pickle.dump(item, file, protocol=pickle.HIGHEST_PROTOCOL)
+        return run_file
+
+    def _reduce_runs(self):
+        """Merges the oldest run files into one until MAX_MERGE_RUNS remain"""
+        while len(self.runs) > MAX_MERGE_RUNS:
+            merged, self.runs = self.runs[:MAX_MERGE_RUNS], self.runs[MAX_MERGE_RUNS:]
+            self.runs.append(self._write_run(heapq.merge(*map(self._read_run, merged),
+                                                         key=itemgetter(0))))
+            for run_file in merged:
+                os.remove(run_file)
+
+    @staticmethod
+    def _read_run(run_file):
+        with open(run_file, 'rb') as file:
+            while True:
+                try:
+                    yield pickle.load(file)
+                except EOFError:
+                    return
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        self._buffer.sort(key=itemgetter(0))
+        self._reduce_runs()
+        runs = [self._read_run(run_file) for run_file in self.runs] + [iter(self._buffer)]
+        for _, payload in heapq.merge(*runs, key=itemgetter(0)):
+            yield pickle.loads(payload)
+
+    def close(self):
+        """Removes the run files"""
+        self._buffer = []
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def merge_join(left, right, key):
+    """
+    Args
+    -----
+    two record iterables sorted on key(record)
+
+    Returns
+    -------
+    yields (key, left records, right records) for every key found on either
+    side in one streaming pass, only the records of one key are held at a time
+    """
+    left_groups = groupby(left, key)
+    right_groups = groupby(right, key)
+    left_key, left_recs = next(left_groups, (None, None))
+    right_key, right_recs = next(right_groups, (None, None))
+    while left_recs is not None or right_recs is not None:
+        if right_recs is None or (left_recs is not None and left_key < right_key):
+            yield left_key, list(left_recs), []
+            left_key, left_recs = next(left_groups, (None, None))
+        elif left_recs is None or right_key < left_key:
+            yield right_key, [], list(right_recs)
+            right_key, right_recs = next(right_groups, (None, None))
+        else:
+            yield left_key, list(left_recs), list(right_recs)
+            left_key, left_recs = next(left_groups, (None, None))
+            right_key, right_recs = next(right_groups, (None, None))
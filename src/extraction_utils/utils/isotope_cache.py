@@ -0,0 +1,138 @@
+"""Module to cache device tables parsed from golden spf files on disk"""
+import hashlib
+import json
+import logging
+import os
+from .device_table import DeviceTable
+
+CACHE_VERSION = 2
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+HASH_BLOCK = 16 * 1024 * 1024
+
+
+def file_stamp(file_path) -> dict:
+    """Returns path, size and modification time of a file"""
+    stat = os.stat(file_path)
+    return {'version': CACHE_VERSION, 'path': os.path.abspath(str(file_path)),
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def content_hash(file_path) -> str:
+    """Returns the blake2b digest of the file contents"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_write(file_path, data: bytes):
+    tmp_file = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_file, file_path)
+
+
+class ParsedSpfCache:
+    """On disk cache of device tables parsed from spf files keyed by path,
+    size, modification time and content hash. Entries are npz files of json
+    metadata and integer columns, never unpickled, so a cache directory shared
+    between regressions can not run code. Entries are evicted least recently
+    used first once the cache grows beyond max_bytes"""
+
+    def __init__(self, cache_dir, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args
+        -----
+        cache_dir: directory holding the cache, shared between runs
+        max_bytes: size limit of the cached entries
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.stamp_dir = os.path.join(self.cache_dir, 'stamps')
+        self.entry_dir = os.path.join(self.cache_dir, 'entries')
+        os.makedirs(self.stamp_dir, exist_ok=True)
+        os.makedirs(self.entry_dir, exist_ok=True)
+
+    def _stamp_file(self, stamp: dict) -> str:
+        name = hashlib.sha1(json.dumps(stamp, sort_keys=True).encode('utf8')).hexdigest()
+        return os.path.join(self.stamp_dir, name + '.json')
+
+    def _entry_file(self, digest: str) -> str:
+        return os.path.join(self.entry_dir, digest + '.npz')
+
+    def entry_key(self, file_path) -> str:
+        """Returns the content hash of a file, reusing the hash recorded for an
+        unchanged path, size and modification time"""
+        stamp = self._stamp_file(file_stamp(file_path))
+        try:
+            with open(stamp, 'r', encoding='utf8') as stamp_file:
+                return json.load(stamp_file)['content_hash']
+        except (OSError, ValueError, KeyError):
+            pass
+        digest = content_hash(file_path)
+        try:
+            _atomic_write(stamp, json.dumps({'content_hash': digest}).encode('utf8'))
+        except OSError as error:
+            logging.warning("Could not record cache stamp for %s: %s", file_path, error)
+        return digest
+
+    def get(self, file_path):
+        """Returns the cached device table of a file, None on a cache miss"""
+        entry = self._entry_file(self.entry_key(file_path))
+        try:
+            table = DeviceTable.load(entry)
+        except (OSError, ValueError, KeyError) as error:
+            if os.path.exists(entry):
+                logging.warning("Ignoring unreadable cache entry %s: %s", entry, error)
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        logging.info("Loaded parsed data of %s from cache %s", file_path, entry)
+        return table
+
+    def put(self, file_path, table: DeviceTable):
+        """Stores the device table of a file and evicts old entries"""
+        entry = self._entry_file(self.entry_key(file_path))
+        tmp_file = f'{entry}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_file, 'wb') as entry_file:
+                table.save(entry_file)
+            os.replace(tmp_file, entry)
+        except OSError as error:
+            logging.warning("Could not write cache entry %s: %s", entry, error)
+            return
+        self.evict()
+
+    def get_or_build(self, file_path, builder):
+        """Returns the cached device table of a file, calling builder(file_path)
+        and caching its result on a cache miss"""
+        table = self.get(file_path)
+        if table is None:
+            table = builder(file_path)
+            self.put(file_path, table)
+        return table
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for name in os.listdir(self.entry_dir):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.entry_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.entry_dir, name))
+                logging.info("Evicted cache entry %s", name)
+            except OSError:
+                continue
+            total -= size
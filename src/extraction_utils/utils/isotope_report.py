@@ -0,0 +1,102 @@
+"""Module to write isotope reports with low overhead"""
+import logging
+import logging.handlers
+import queue
+import threading
+
+BATCH_CHARS = 1024 * 1024
+QUEUE_DEPTH = 16
+PUT_TIMEOUT = 1
+REPORT_MODES = ('mismatch', 'verbose')
+
+
+class BackgroundWriter:
+    """File like object collecting writes in memory and handing them in
+    batches to a writer thread, so report formatting and file I/O overlap"""
+
+    def __init__(self, file_path, batch_chars: int = BATCH_CHARS):
+        self.file_path = str(file_path)
+        self.batch_chars = batch_chars
+        self._file = open(self.file_path, 'w', encoding='utf8')
+        self._queue = queue.Queue(maxsize=QUEUE_DEPTH)
+        self._buffer = []
+        self._size = 0
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=f'writer-{self.file_path}',
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            if self._error is None:
+                try:
+                    self._file.write(chunk)
+                except Exception as error:
+                    self._error = error
+
+    def _put(self, chunk):
+        while True:
+            try:
+                self._queue.put(chunk, timeout=PUT_TIMEOUT)
+                return
+            except queue.Full:
+                if not self._thread.is_alive():
+                    raise Exception(f"Writer thread of {self.file_path} stopped")
+
+    def write(self, text: str):
+        """Buffers text, handing a batch to the writer thread when it is full"""
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= self.batch_chars:
+            self.flush()
+
+    def flush(self):
+        """Hands the buffered text to the writer thread, raises the error of a
+        failed write instead"""
+        if self._error is not None:
+            raise self._error
+        if self._buffer:
+            if not self._thread.is_alive():
+                raise Exception(f"Writer thread of {self.file_path} stopped")
+            self._put(''.join(self._buffer))
+            self._buffer = []
+            self._size = 0
+
+    def close(self):
+        """Writes the remaining text, waits for the writer thread and closes
+        the file, also when a write failed"""
+        try:
+            if self._thread.is_alive():
+                self.flush()
+        finally:
+            if self._thread.is_alive():
+                self._put(None)
+                self._thread.join()
+            self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class BackgroundLogHandler(logging.handlers.QueueHandler):
+    """Log handler passing records to a file handler running in a listener
+    thread, stop() has to be called to write the remaining records"""
+
+    def __init__(self, file_handler: logging.Handler):
+        super().__init__(queue.Queue())
+        self.listener = logging.handlers.QueueListener(self.queue, file_handler)
+        self.listener.start()
+
+    def stop(self):
+        """Writes the queued records and stops the listener thread"""
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
@@ -0,0 +1,64 @@
+"""Module to write isotope results as line delimited json records"""
+import json
+import time
+from .isotope_report import BackgroundWriter
+
+RESULTS_FILE = 'isotope_results.jsonl'
+SUMMARY_FILE = 'Results.jsonl'
+
+
+class ResultsWriter:
+    """Writes one json record per line for every mismatching property and
+    every unmatched device of a comparison. Every record carries the run
+    context (cell, skew, comparison type...) so record files of many runs can
+    be concatenated and aggregated directly"""
+
+    def __init__(self, file_path, context: dict):
+        """
+        Args
+        -----
+        file_path: path of the json lines file, overwritten
+        context: fields added to every record
+        """
+        self.context = dict(context)
+        self.num_records = 0
+        self._file = BackgroundWriter(file_path)
+
+    def record(self, kind: str, **fields):
+        """Writes a record of the given kind"""
+        self._file.write(json.dumps({'record': kind, **self.context, **fields}) + '\n')
+        self.num_records += 1
+
+    def mismatch(self, ref_dev, cur_dev, props):
+        """Writes one mismatch record per property of a device pair"""
+        for prop in props:
+            self.record('mismatch', device=ref_dev.get("PROPERTY"),
+                        sample_device=cur_dev.get("PROPERTY"),
+                        model=ref_dev.get("device_type"), property=prop,
+                        golden=ref_dev.get(prop), sample=cur_dev.get(prop),
+                        x=ref_dev.get("x"), y=ref_dev.get("y"), angle=ref_dev.get("angle"))
+
+    def unmatched(self, netlist: str, dev):
+        """Writes the record of a device left without a match in a netlist"""
+        self.record('unmatched', netlist=netlist, device=dev.get("PROPERTY"),
+                    model=dev.get("device_type"), x=dev.get("x"), y=dev.get("y"),
+                    angle=dev.get("angle"), llx=dev.get("llx"), lly=dev.get("lly"))
+
+    def close(self):
+        """Writes the pending records"""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def append_summary(file_path, context: dict, **fields):
+    """Appends the summary record of a comparison to a json lines file shared
+    by the comparisons of a run directory"""
+    summary = {'record': 'summary', **context,
+               'time': time.strftime('%Y-%m-%dT%H:%M:%S'), **fields}
+    with open(file_path, 'a', encoding='utf8') as summary_file:
+        summary_file.write(json.dumps(summary) + '\n')
@@ -1,12 +1,28 @@
 """Module to run isotope"""
+import io
 import os
 import getpass
-import shutil
-import re
 from pathlib import Path
 import logging
+from collections import Counter, OrderedDict
+import numpy as np
 from waldo.model import Kit
 from waldo.tool.virtuoso import Virtuoso
+from .device_match import DeviceMatcher, SpatialIndex, OA_KEY_PROPS, \
+    device_key, placement_sort_key
+from .device_intern import DeviceInterner
+from .device_table import DeviceTable, StringPool, match_tables, compare_tables
+from .external_sort import ExternalSorter, merge_join
+from .isotope_cache import ParsedSpfCache, DEFAULT_MAX_BYTES
+from .isotope_results import ResultsWriter, append_summary, RESULTS_FILE, SUMMARY_FILE
+from .isotope_report import BackgroundWriter, BackgroundLogHandler, REPORT_MODES
+from .oa_staging import stage_tree
+from .prim_devices import PrimDeviceCache
+from .property_compare import PropertyComparator, parse_tolerances
+from .property_rules import RuleChecker, parse_rules, ICV_DEFAULT_RULES
+from .scs_netlist import iter_logical_lines, iter_instances, instance_device
+from .spf_index import SpfIndex
+from .spf_parser import iter_devices, iter_spf_devices, iter_spf_device_chunks
 
 
 class Isotope:
@@ -31,8 +47,30 @@ class Isotope:
         self.extract_dir = self._kwargs.get('extract_dir')
         self.Isotope_extra = self._kwargs.get('Isotope_extra')
         self.exclude_list = set()
+        self.device_table = self._kwargs.get('device_table')
+        self.isotope_workers = int(self._kwargs.get('isotope_workers') or 1)
+        self.isotope_memory_mb = float(self._kwargs.get('isotope_memory_mb') or 0)
+        self.isotope_spill_dir = self._kwargs.get('isotope_spill_dir') or self.run_directory
+        self.isotope_rules = parse_rules(self._kwargs.get('isotope_rules'))
+        self.rule_checker = None
+        self.comparator = PropertyComparator(parse_tolerances(self._kwargs.get('isotope_tolerances')))
+        self.isotope_report = str(self._kwargs.get('isotope_report') or 'mismatch')
+        if self.isotope_report not in REPORT_MODES:
+            raise Exception(f"isotope_report should be one of {', '.join(REPORT_MODES)}")
+        self.verbose_report = self.isotope_report == 'verbose'
+        self.pair_counts = Counter()
+        self.property_mismatches = Counter()
+        self.isotope_results = bool(self._kwargs.get('isotope_results', True))
+        self.results = None
+        self.reference_cache = None
+        if self._kwargs.get('isotope_cache_dir'):
+            max_gb = self._kwargs.get('isotope_cache_max_gb')
+            self.reference_cache = ParsedSpfCache(
+                self._kwargs.get('isotope_cache_dir'),
+                float(max_gb) * 1024 ** 3 if max_gb else DEFAULT_MAX_BYTES)
         if str(self.Isotope_extra).startswith("ignore"):
             self.exclude_list.update(self.Isotope_extra.split(" ")[1].split(","))
+        self.interner = DeviceInterner(self.exclude_list)
 
         self.spf_vs_spf = self._kwargs.get('spf_vs_spf')
         self.oa_vs_spf = self._kwargs.get('oa_vs_spf')
@@ -41,6 +79,11 @@ class Isotope:
         if self.spf_vs_spf:
             self.test_spf_filepath = self._kwargs.get('test_spf_filepath')
             self.reference_spf_filepath = self._kwargs.get('reference_spf_filepath')
+            self.smc_corners = self._kwargs.get('smc_corners') or []
+            if isinstance(self.smc_corners, str):
+                self.smc_corners = [corner.strip() for corner in self.smc_corners.split(',')
+                                    if corner.strip()]
+            self.corner_status = OrderedDict()
 
         if self.oa_vs_spf:
             self.tech_opt = self._kwargs.get('tech_opt')
@@ -49,6 +92,10 @@ class Isotope:
             self.kit = Kit.get(self.kit_name, self.tech_opt)
             self.library = 'intel'+str(self.kit.tech_id)+'prim'
             self.reference_spf_filepath = self._kwargs.get('reference_spf_filepath')
+            self.oa_coord_tolerance = float(self._kwargs.get('oa_coord_tolerance') or 0.0)
+            self.prim_cache = PrimDeviceCache(self._kwargs.get('isotope_cache_dir'))
+            self.oa_stage_mode = self._kwargs.get('oa_stage_mode') or 'auto'
+            self.oa_views = self.parse_oa_views(self._kwargs.get('oa_views'))
 
         self.out_dir = self.run_directory
 
@@ -57,7 +104,9 @@ class Isotope:
          input preferences"""
         isotope_flag = False
         try:
-            if self.spf_vs_spf:
+            if self.spf_vs_spf and self.smc_corners:
+                isotope_flag = self.smc_isotope()
+            elif self.spf_vs_spf:
                 isotope_flag = self.spf_isotope()
             elif self.oa_vs_spf:
                 isotope_flag = self.oa_isotope()
@@ -79,6 +128,7 @@ class Isotope:
                         skew_out_dir = os.path.join(self.out_dir, self.skew)
                         if not os.path.exists(skew_out_dir):
                             os.makedirs(skew_out_dir)
+                        self.rule_checker = self.create_rule_checker()
                         if self.compare_spf_instances(skew_out_dir):
                             ins_flag = True
                             res_str = "ISOTOPE : Pass\n"
@@ -93,30 +143,163 @@ class Isotope:
 
                 result_file.write(f'{self.skew}\nOLD SPF : {self.reference_spf_filepath}\n'
                                   f'NEW SPF : {self.test_spf_filepath}\n{res_str}\n\n')
+                self.corner_status[self.skew] = ins_flag
             if self.lvs_tool_name == 'icv':
                 isotope_flag = ins_flag and self.ped_pes_check()
             if self.lvs_tool_name == 'calibre':
-                isotope_flag = ins_flag
+                isotope_flag = ins_flag and self.ped_pes_check()
+            self.write_results_summary(isotope_flag, os.path.join(skew_out_dir, RESULTS_FILE),
+                                       instances="Pass" if ins_flag else "Fail")
             return isotope_flag
 
         except Exception as error:
             logging.exception("Exception at: %s", error)
             raise error
 
+    def smc_isotope(self) -> bool:
+        """Run method for multi corner smc isotope. The spf file of every corner
+        is <test_spf_filepath>.<skew>_<temp>, compared against
+        <reference_spf_filepath>.<skew>_<temp> when it exists and the reference
+        file itself otherwise. Corners sharing the instance sections of an
+        already compared corner reuse its result
+
+        Returns
+        --------
+        True if every corner passes"""
+        test_spf, reference_spf, skew = \
+            self.test_spf_filepath, self.reference_spf_filepath, self.skew
+        compared = {}
+        corner_flags = OrderedDict()
+        try:
+            for corner in self.smc_corners:
+                self.skew = corner
+                self.test_spf_filepath = f'{test_spf}.{corner}'
+                self.reference_spf_filepath = f'{reference_spf}.{corner}'
+                if not os.path.isfile(self.reference_spf_filepath):
+                    self.reference_spf_filepath = reference_spf
+                key = self.instance_key()
+                if key is not None and key in compared:
+                    first_corner = compared[key]
+                    corner_flags[corner] = corner_flags[first_corner]
+                    self.corner_status[corner] = self.corner_status[first_corner]
+                    self.write_shared_corner_result(corner, first_corner)
+                    continue
+                corner_flags[corner] = self.spf_isotope()
+                compared[key] = corner
+            for corner, status in self.corner_status.items():
+                logging.info("SMC corner %s : ISOTOPE %s", corner, "Pass" if status else "Fail")
+            logging.info("%d corner(s) checked with %d instance comparison(s)",
+                         len(corner_flags), len(compared))
+        except Exception as error:
+            logging.exception("Exception at: %s", error)
+            raise error
+        finally:
+            self.test_spf_filepath, self.reference_spf_filepath, self.skew = \
+                test_spf, reference_spf, skew
+        return all(corner_flags.values())
+
+    def instance_key(self):
+        """
+        Returns
+        --------
+        digests of the instance sections of the test and reference spf files,
+        None if one of them is missing or empty"""
+        for spf_file in (self.test_spf_filepath, self.reference_spf_filepath):
+            if not os.path.isfile(spf_file) or os.stat(spf_file).st_size == 0:
+                return None
+        index_dir = self._kwargs.get('isotope_cache_dir')
+        return (SpfIndex(self.test_spf_filepath, index_dir=index_dir).instance_hash,
+                SpfIndex(self.reference_spf_filepath, index_dir=index_dir).instance_hash)
+
+    def write_shared_corner_result(self, corner, first_corner):
+        """Writes the result of a corner whose instance sections match the ones
+        of an already compared corner to the summary file"""
+        res_str = "Pass" if self.corner_status[corner] else "Fail"
+        logging.info("Instance sections of corner %s match corner %s, reusing its result",
+                     corner, first_corner)
+        summary_file = str(os.path.join(self.out_dir, "Results.summary"))
+        with open(summary_file, 'a', encoding='utf8') as result_file:
+            result_file.write(f'{corner}\nOLD SPF : {self.reference_spf_filepath}\n'
+                              f'NEW SPF : {self.test_spf_filepath}\n'
+                              f'ISOTOPE : {res_str} (same instance section as {first_corner})'
+                              f'\n\n\n')
+        if self.isotope_results:
+            append_summary(os.path.join(self.out_dir, SUMMARY_FILE), self.results_context(),
+                           status=res_str, shared_with=first_corner)
+
+    def results_context(self) -> dict:
+        """Returns the fields identifying the comparison in structured results"""
+        return {'kit': self.kit_name, 'cell': self.cell_name,
+                'comparison': 'spf_vs_spf' if self.spf_vs_spf else 'oa_vs_spf',
+                'lvs_tool': self.lvs_tool_name, 'skew': self.skew,
+                'temperature': self.temperature,
+                'golden_file': str(self.reference_spf_filepath),
+                'sample_file': str(self.test_spf_filepath) if self.spf_vs_spf else None}
+
+    def open_results(self, out_dir):
+        """Starts the structured results of a comparison in out_dir, returns the
+        results writer, None when isotope_results is disabled"""
+        self.pair_counts.clear()
+        self.property_mismatches.clear()
+        self.results = None
+        if self.isotope_results:
+            self.results = ResultsWriter(os.path.join(out_dir, RESULTS_FILE),
+                                         self.results_context())
+        return self.results
+
+    def close_results(self):
+        """Writes the pending structured results of a comparison"""
+        if self.results is not None:
+            self.results.close()
+            self.results = None
+
+    def write_results_summary(self, passed: bool, results_file=None, **fields):
+        """Appends the summary record of the last comparison to Results.jsonl"""
+        if not self.isotope_results:
+            return
+        summary = {'status': "Pass" if passed else "Fail",
+                   'pairs': self.pair_counts['matched'] + self.pair_counts['mismatched'],
+                   'matched': self.pair_counts['matched'],
+                   'mismatched': self.pair_counts['mismatched'],
+                   'unmatched_golden': self.pair_counts['unmatched_golden'],
+                   'unmatched_sample': self.pair_counts['unmatched_sample'],
+                   'duplicates': self.pair_counts['duplicates'],
+                   'property_mismatches': dict(self.property_mismatches),
+                   'results_file': results_file}
+        if self.rule_checker is not None and self.rule_checker.checked:
+            summary['rule_violations'] = dict(self.rule_checker.violations)
+        summary.update(fields)
+        append_summary(os.path.join(self.out_dir, SUMMARY_FILE), self.results_context(),
+                       **summary)
+
     @staticmethod
-    def create_isotope_logger(log_file_name, log_dir):
-        """Method to create log files for isotope"""
+    def create_isotope_logger(log_file_name, log_dir, background=False):
+        """Method to create log files for isotope, records of a background
+        logger are written by a listener thread"""
 
         formatter = logging.Formatter('%(levelname)s %(asctime)s %(message)s',
                                       datefmt="(%a %b %d %H:%M:%S %Y)")
         handler = logging.FileHandler(f'{log_dir}/{log_file_name}', mode='w')
         handler.setFormatter(formatter)
+        if background:
+            handler = BackgroundLogHandler(handler)
         logger = logging.getLogger(log_file_name)
         logger.setLevel(10)
         logger.addHandler(handler)
 
         return logger
 
+    @staticmethod
+    def close_isotope_logger(logger):
+        """Method to write the pending records of an isotope logger and close
+        its log file"""
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if isinstance(handler, BackgroundLogHandler):
+                handler.stop()
+            else:
+                handler.close()
+
     def compare_spf_instances(self, skew_out_dir) -> bool:
         """Args
         ---------
@@ -125,118 +308,389 @@ class Isotope:
         Returns
         --------
         Performs instance section comparison for the input files and returns True
-        if they are 100% match"""
+        if they are 100% match. Only mismatching devices and the summary counts
+        are reported unless isotope_report is verbose"""
 
+        comparison_logger = self.create_isotope_logger("comparison.log", skew_out_dir,
+                                                       background=True)
+        comparison_logger.propagate = False
+        parser_logger = self.create_isotope_logger("parser.log", skew_out_dir)
         try:
+            self.open_results(skew_out_dir)
+            rep_file = os.path.join(skew_out_dir, "propertymatch.rpt")
+            with BackgroundWriter(rep_file) as rep_file:
+                rep_file.write("LIST OF PARAMETERS IGNORED DURING COMPARISON:  ")
+                for item in self.exclude_list:
+                    rep_file.write(item + ' ')
+                rep_file.write('\n# PROPERTY MATCH/MISMATCH TABLE:\n# ' + '=' * 140 + '\n')
+                rep_file.write(f"# {'NETLIST':22}{'DEVICE NAME':25}{'DEVICE MODEL':20}"
+                               f"{'MATCHED PROPERTIES':23}{'MISMATCHED PROPERTIES':21}\n")
+                rep_file.write('# ' + '=' * 140 + '\n''# ' + '=' * 140 + '\n')
+                if self.isotope_memory_mb:
+                    comp_res = self.compare_spf_external(rep_file, comparison_logger,
+                                                         parser_logger)
+                elif self.device_table:
+                    comp_res = self.compare_spf_tables(rep_file, comparison_logger, parser_logger)
+                else:
+                    comp_res = self.compare_spf_stream(rep_file, comparison_logger, parser_logger)
+                self.write_report_summary(rep_file, comparison_logger)
+        except Exception as error:
+            logging.exception(("Exception at: %s", error))
+            raise error
+        finally:
+            self.close_results()
+            self.close_isotope_logger(comparison_logger)
+            self.close_isotope_logger(parser_logger)
+        return comp_res
 
-            comparison_logger = self.create_isotope_logger("comparison.log", skew_out_dir)
-            comparison_logger.propagate = False
-            parser_logger = self.create_isotope_logger("parser.log", skew_out_dir)
+    def compare_spf_stream(self, rep_file, comparison_logger, parser_logger) -> bool:
+        """Args
+        ---------
+        report file, comparison logger and parser logger
 
-            parser_logger.info("Parsing DSPF %s", self.reference_spf_filepath)
-            dev_data_ref = self.get_spf_instance_data(self.reference_spf_filepath)
-            parser_logger.info("DONE")
-            parser_logger.info("Parsing DSPF %s", self.test_spf_filepath)
-            dev_data_cur = self.get_spf_instance_data(self.test_spf_filepath)
-            parser_logger.info("DONE")
+        Returns
+        --------
+        Indexes the sample devices and streams the golden devices through the
+        index, returns True if every device pair matches"""
+        parser_logger.info("Parsing DSPF %s", self.test_spf_filepath)
+        dev_data_cur = self.get_spf_instance_data(self.test_spf_filepath)
+        parser_logger.info("DONE")
+        parser_logger.info("Streaming DSPF %s", self.reference_spf_filepath)
+
+        comp_res = True
+        comparison_logger.log(0, "START COMPARISON")
+        if self.rule_checker is not None:
+            dev_data_cur = self.rule_checker.watch(dev_data_cur)
+        matcher = DeviceMatcher(dev_data_cur)
+        for ref_dev, cur_dev in matcher.match(self.iter_reference_devices()):
+            if self.verbose_report:
+                comparison_logger.info("Finding match for %s device in position %s %s %s"
+                                       " in golden netlist", ref_dev.get("PROPERTY"),
+                                       "x = " + ref_dev.get("x"), "y = " + ref_dev.get("y"),
+                                       "angle = " + ref_dev.get("angle"))
+            if cur_dev is None:
+                comp_res = False
+                comparison_logger.info("No match found in sample netlist for %s device",
+                                       ref_dev.get("PROPERTY"))
+                continue
+            if not self.compare_device_properties(ref_dev, cur_dev, rep_file,
+                                                  comparison_logger):
+                comp_res = False
+        parser_logger.info("%d instance(s) found in golden netlist and "
+                           "%d instance(s) found in sample netlist",
+                           matcher.num_ref, matcher.num_cur)
+        if matcher.num_ref != matcher.num_cur:
+            logging.info("Number of instances did not match for the files")
+            comp_res = False
+        if not self.write_unmatched_devices(matcher.unmatched_ref, matcher.unmatched_cur(),
+                                            matcher.duplicates, rep_file, comparison_logger):
+            comp_res = False
+        return comp_res
+
+    def compare_spf_tables(self, rep_file, comparison_logger, parser_logger) -> bool:
+        """Args
+        ---------
+        report file, comparison logger and parser logger
+
+        Returns
+        --------
+        Loads both instance sections into columnar device tables, matches and
+        compares them with vectorized column operations and returns True if
+        every device pair matches"""
+        parser_logger.info("Parsing DSPF %s", self.reference_spf_filepath)
+        ref_table = self.get_reference_table()
+        parser_logger.info("DONE")
+        parser_logger.info("Parsing DSPF %s", self.test_spf_filepath)
+        cur_table = DeviceTable.from_spf(self.test_spf_filepath, ref_table.pool,
+                                         self.isotope_workers)
+        parser_logger.info("DONE")
+        parser_logger.info("%d instance(s) found in golden netlist and "
+                           "%d instance(s) found in sample netlist",
+                           len(ref_table), len(cur_table))
+        if self.rule_checker is not None:
+            self.rule_checker.check_table(cur_table)
+
+        comp_res = len(ref_table) == len(cur_table)
+        if not comp_res:
+            logging.info("Number of instances did not match for the files")
+        comparison_logger.log(0, "START COMPARISON")
+        ref_idx, cur_idx, unmatched_ref, unmatched_cur, duplicates = \
+            match_tables(ref_table, cur_table)
+        exclude_list = self.exclude_list | {"PROPERTY"}
+        props = sorted((set(ref_table.prop_codes) | set(cur_table.prop_codes)) - exclude_list)
+        pair_match = ref_table.fingerprints(props)[ref_idx] == \
+            cur_table.fingerprints(props)[cur_idx]
+        drill_down = np.flatnonzero(~pair_match)
+        pair_match[drill_down] = compare_tables(ref_table, cur_table, ref_idx[drill_down],
+                                                cur_idx[drill_down], exclude_list,
+                                                self.comparator)
+        comparison_logger.info("%d device pair(s) matched by position, %d with mismatched"
+                               " properties", len(ref_idx), int((~pair_match).sum()))
+        if not pair_match.all():
+            comp_res = False
+        if not self.verbose_report:
+            self.pair_counts['matched'] += int(pair_match.sum())
+            ref_idx, cur_idx = ref_idx[~pair_match], cur_idx[~pair_match]
+        for ref_row, cur_row in zip(ref_idx, cur_idx):
+            self.compare_device_properties(ref_table.device(ref_row), cur_table.device(cur_row),
+                                           rep_file, comparison_logger)
+        if not self.write_unmatched_devices([ref_table.device(row) for row in unmatched_ref],
+                                            [cur_table.device(row) for row in unmatched_cur],
+                                            duplicates, rep_file, comparison_logger):
+            comp_res = False
+        return comp_res
+
+    def compare_spf_external(self, rep_file, comparison_logger, parser_logger) -> bool:
+        """Args
+        ---------
+        report file, comparison logger and parser logger
 
+        Returns
+        --------
+        Spills the devices of both files into run files sorted on placement and
+        merge joins them in one streaming pass within isotope_memory_mb, report
+        entries are sorted back to golden netlist order and duplicate positions
+        to the order DeviceMatcher finds them in. Returns True if every device
+        pair matches"""
+        budget = int(self.isotope_memory_mb * 1024 ** 2) // 6
+        with ExternalSorter(budget, self.isotope_spill_dir) as ref_runs, \
+                ExternalSorter(budget, self.isotope_spill_dir) as cur_runs, \
+                ExternalSorter(budget, self.isotope_spill_dir) as report, \
+                ExternalSorter(budget, self.isotope_spill_dir) as unmatched_ref, \
+                ExternalSorter(budget, self.isotope_spill_dir) as unmatched_cur, \
+                ExternalSorter(budget, self.isotope_spill_dir) as duplicate_runs:
+            parser_logger.info("Spilling DSPF %s", self.reference_spf_filepath)
+            for seq, dev in enumerate(iter_spf_devices(self.reference_spf_filepath)):
+                ref_runs.add(placement_sort_key(dev) + (seq,), (seq, dev))
+            parser_logger.info("Spilling DSPF %s", self.test_spf_filepath)
+            dev_data_cur = iter_spf_devices(self.test_spf_filepath)
+            if self.rule_checker is not None:
+                dev_data_cur = self.rule_checker.watch(dev_data_cur)
+            for seq, dev in enumerate(dev_data_cur):
+                cur_runs.add(placement_sort_key(dev) + (seq,), (seq, dev))
+            parser_logger.info("DONE")
             parser_logger.info("%d instance(s) found in golden netlist and "
                                "%d instance(s) found in sample netlist",
-                               len(dev_data_ref), len(dev_data_cur))
-
-            if len(dev_data_ref) == len(dev_data_cur):
-                rep_file = os.path.join(skew_out_dir, "propertymatch.rpt")
-                with open(rep_file, 'w', encoding='utf8') as rep_file:
-                    rep_file.write("LIST OF PARAMETERS IGNORED DURING COMPARISON:  ")
-                    for item in self.exclude_list:
-                        rep_file.write(item + ' ')
-                    rep_file.write('\n# PROPERTY MATCH/MISMATCH TABLE:\n# ' + '=' * 140 + '\n')
-                    rep_file.write(f"# {'NETLIST':22}{'DEVICE NAME':25}{'DEVICE MODEL':20}"
-                                   f"{'MATCHED PROPERTIES':23}{'MISMATCHED PROPERTIES':21}\n")
-                    rep_file.write('# ' + '=' * 140 + '\n''# ' + '=' * 140 + '\n')
-                    comp_res = True
-                    comparison_logger.log(0, "START COMPARISON")
-                    for _, ref_dev in enumerate(dev_data_ref):
-                        comparison_logger.info("Finding match for %s device in position %s %s %s"
-                                               " in golden netlist", ref_dev.get("PROPERTY"),
-                                               "x = " + ref_dev.get("x"), "y = " + ref_dev.get("y"),
-                                               "angle = " + ref_dev.get("angle"))
-                        for _, cur_dev in enumerate(dev_data_cur):
-                            golden_replist = []
-                            sample_replist = []
-                            if ref_dev.get("x") == cur_dev.get("x") and \
-                                    ref_dev.get("y") == cur_dev.get("y") and \
-                                    ref_dev.get("angle") == cur_dev.get("angle"):
-                                comparison_logger.info("Match found in sample netlist"
-                                                       " with %s device", cur_dev.get("PROPERTY"))
-                                comparison_logger.info("Comparing properties of %s in golden"
-                                                       " netlist with %s in sample netlist",
-                                                       ref_dev.get("PROPERTY"),
-                                                       cur_dev.get("PROPERTY"))
-                                rep_file.write(f"# {'MATCHED':<140}\n")
-                                rep_file.write(f'# {"GOLDEN":<6}{ref_dev.get("PROPERTY"):>26}'
-                                               f'{ref_dev.get("device_type"):>26}\n')
-                                sample_replist.append(f"# {'SAMPLE':<6}{cur_dev.get('PROPERTY'):>26}"
-                                                      f"{cur_dev.get('device_type'):>26}\n")
-                                for param in ref_dev:
-                                    if param != "PROPERTY" and param not in self.exclude_list:
-                                        if ref_dev.get(param) == cur_dev.get(param):
-                                            comparison_logger.info("Matched property %s",
-                                                                   param + " = " + ref_dev.get(param))
-                                            golden_replist. \
-                                                append(f"# {param + ' = ' + ref_dev.get(param):>85}\n")
-                                            sample_replist. \
-                                                append(f"# {param + ' = ' + cur_dev.get(param):>85}\n")
-                                        else:
-                                            comp_res = False
-                                            comparison_logger.info("Mismatched properties %s in"
-                                                                   " golden netlist %s in sample"
-                                                                   " netlist",
-                                                                   param + " " + ref_dev.get(param),
-                                                                   param + " = " + cur_dev.get(param))
-                                            rep_file.write(f"# {'MISMATCHED':<140}\n")
-                                            golden_replist. \
-                                                append(f"# {param + ' = ' + ref_dev.get(param):>111}\n")
-                                            sample_replist. \
-                                                append(f"# {param + ' = ' + cur_dev.get(param):>111}\n")
-                                for item in golden_replist:
-                                    rep_file.write(item)
-                                rep_file.write('# ' + '-' * 140 + '\n')
-                                for item in sample_replist:
-                                    rep_file.write(item)
-                                rep_file.write(('# ' + ' ' * 140 + '\n') * 2)
-                                rep_file.write('# ' + '=' * 140 + '\n')
-            else:
+                               len(ref_runs), len(cur_runs))
+
+            comp_res = len(ref_runs) == len(cur_runs)
+            if not comp_res:
                 logging.info("Number of instances did not match for the files")
+            comparison_logger.log(0, "START COMPARISON")
+            for _, ref_group, cur_group in merge_join(ref_runs, cur_runs,
+                                                      lambda rec: placement_sort_key(rec[1])):
+                if len(ref_group) > 1 or len(cur_group) > 1:
+                    # sample duplicates in sample netlist order first, then golden only
+                    # duplicates in the order of their second golden device
+                    order = (0, cur_group[0][0]) if len(cur_group) > 1 else (1, ref_group[1][0])
+                    duplicate_runs.add(order, (device_key((ref_group or cur_group)[0][1]),
+                                               (len(ref_group), len(cur_group))))
+                for rank, (seq, ref_dev) in enumerate(ref_group):
+                    if rank >= len(cur_group):
+                        comp_res = False
+                        comparison_logger.info("No match found in sample netlist for %s device",
+                                               ref_dev.get("PROPERTY"))
+                        unmatched_ref.add(seq, ref_dev)
+                        continue
+                    entry = io.StringIO()
+                    if not self.compare_device_properties(ref_dev, cur_group[rank][1], entry,
+                                                          comparison_logger):
+                        comp_res = False
+                    if entry.tell():
+                        report.add(seq, entry.getvalue())
+                for seq, cur_dev in cur_group[len(ref_group):]:
+                    unmatched_cur.add(seq, cur_dev)
+            for entry in report:
+                rep_file.write(entry)
+            duplicates = OrderedDict(duplicate_runs)
+            if duplicates:
+                logging.warning("%d position(s) are shared by more than one device",
+                                len(duplicates))
+            if not self.write_unmatched_devices(unmatched_ref, unmatched_cur, duplicates,
+                                                rep_file, comparison_logger):
                 comp_res = False
-        except Exception as error:
-            logging.exception(("Exception at: %s", error))
-            raise error
         return comp_res
 
+    def get_reference_table(self) -> DeviceTable:
+        """
+        Returns
+        -------
+        device table of the reference spf file, loaded from the reference cache
+        when the file was parsed before"""
+        def build(spf_file):
+            return DeviceTable.from_spf(spf_file, StringPool(), self.isotope_workers)
+
+        if self.reference_cache is None:
+            return build(self.reference_spf_filepath)
+        return self.reference_cache.get_or_build(self.reference_spf_filepath, build)
+
+    def iter_reference_devices(self):
+        """
+        Returns
+        -------
+        iterable of interned devices of the reference spf file streamed from
+        the file, memory stays bounded by one device and the distinct property
+        sets. The reference cache is only used by the device_table mode which
+        loads whole tables anyway"""
+        return self.interner.intern_all(iter_spf_devices(self.reference_spf_filepath))
+
+    def compare_device_properties(self, ref_dev, cur_dev, rep_file, comparison_logger) -> bool:
+        """Args
+        ---------
+        golden device, sample device placed at the same position, report file
+        and comparison logger
+
+        Returns
+        --------
+        Writes property comparison of the device pair to report file and returns
+        True if all the properties match. Matching pairs are only counted unless
+        isotope_report is verbose, pairs with equal fingerprints skip the
+        property comparison"""
+        fingerprint = getattr(ref_dev, 'fingerprint', None)
+        if not self.verbose_report and fingerprint is not None and \
+                fingerprint == getattr(cur_dev, 'fingerprint', None):
+            self.pair_counts['matched'] += 1
+            return True
+        mismatched = [param for param in ref_dev if param != "PROPERTY"
+                      and param not in self.exclude_list
+                      and not self.comparator.equal(param, ref_dev.get(param),
+                                                    cur_dev.get(param))]
+        self.pair_counts['mismatched' if mismatched else 'matched'] += 1
+        self.property_mismatches.update(mismatched)
+        if mismatched and self.results is not None:
+            self.results.mismatch(ref_dev, cur_dev, mismatched)
+        if not mismatched and not self.verbose_report:
+            return True
+        dev_res = True
+        golden_replist = []
+        sample_replist = []
+        comparison_logger.info("Match found in sample netlist"
+                               " with %s device", cur_dev.get("PROPERTY"))
+        comparison_logger.info("Comparing properties of %s in golden"
+                               " netlist with %s in sample netlist",
+                               ref_dev.get("PROPERTY"),
+                               cur_dev.get("PROPERTY"))
+        rep_file.write(f"# {'MATCHED':<140}\n")
+        rep_file.write(f'# {"GOLDEN":<6}{ref_dev.get("PROPERTY"):>26}'
+                       f'{ref_dev.get("device_type"):>26}\n')
+        sample_replist.append(f"# {'SAMPLE':<6}{cur_dev.get('PROPERTY'):>26}"
+                              f"{cur_dev.get('device_type'):>26}\n")
+        for param in ref_dev:
+            if param != "PROPERTY" and param not in self.exclude_list:
+                if self.comparator.equal(param, ref_dev.get(param), cur_dev.get(param)):
+                    comparison_logger.info("Matched property %s",
+                                           param + " = " + ref_dev.get(param))
+                    golden_replist. \
+                        append(f"# {param + ' = ' + ref_dev.get(param):>85}\n")
+                    sample_replist. \
+                        append(f"# {param + ' = ' + cur_dev.get(param):>85}\n")
+                else:
+                    dev_res = False
+                    comparison_logger.info("Mismatched properties %s in"
+                                           " golden netlist %s in sample"
+                                           " netlist",
+                                           param + " " + ref_dev.get(param),
+                                           param + " = " + cur_dev.get(param))
+                    rep_file.write(f"# {'MISMATCHED':<140}\n")
+                    golden_replist. \
+                        append(f"# {param + ' = ' + ref_dev.get(param):>111}\n")
+                    sample_replist. \
+                        append(f"# {param + ' = ' + cur_dev.get(param):>111}\n")
+        for item in golden_replist:
+            rep_file.write(item)
+        rep_file.write('# ' + '-' * 140 + '\n')
+        for item in sample_replist:
+            rep_file.write(item)
+        rep_file.write(('# ' + ' ' * 140 + '\n') * 2)
+        rep_file.write('# ' + '=' * 140 + '\n')
+        return dev_res
+
+    def write_unmatched_devices(self, unmatched_ref, unmatched_cur, duplicates, rep_file,
+                                comparison_logger) -> bool:
+        """Args
+        ---------
+        golden and sample devices left unmatched, placements shared by more than
+        one device with their golden and sample counts, report file and
+        comparison logger
+
+        Returns
+        --------
+        Writes unmatched and duplicate position devices to report file and
+        returns True if every device found its match"""
+        self.pair_counts['unmatched_golden'] += len(unmatched_ref)
+        self.pair_counts['unmatched_sample'] += len(unmatched_cur)
+        self.pair_counts['duplicates'] += len(duplicates)
+        rep_file.write(f"# UNMATCHED DEVICES: {len(unmatched_ref)} in golden netlist, "
+                       f"{len(unmatched_cur)} in sample netlist\n")
+        for netlist, devs in (("GOLDEN", unmatched_ref), ("SAMPLE", unmatched_cur)):
+            for dev in devs:
+                comparison_logger.info("Unmatched %s device in %s netlist at x = %s y = %s"
+                                       " angle = %s", dev.get("PROPERTY"), netlist.lower(),
+                                       dev.get("x"), dev.get("y"), dev.get("angle"))
+                rep_file.write(f'# {netlist:<6}{dev.get("PROPERTY"):>26}'
+                               f'{dev.get("device_type"):>26}  x = {dev.get("x")}'
+                               f' y = {dev.get("y")} angle = {dev.get("angle")}\n')
+                if self.results is not None:
+                    self.results.unmatched(netlist.lower(), dev)
+        rep_file.write('# ' + '=' * 140 + '\n')
+        rep_file.write(f"# DUPLICATE POSITIONS: {len(duplicates)}\n")
+        for (x_pos, y_pos, angle), (num_ref, num_cur) in duplicates.items():
+            comparison_logger.info("%d golden and %d sample device(s) placed at x = %s y = %s"
+                                   " angle = %s", num_ref, num_cur, x_pos, y_pos, angle)
+            rep_file.write(f"# x = {x_pos} y = {y_pos} angle = {angle}  golden devices = "
+                           f"{num_ref}  sample devices = {num_cur}\n")
+        rep_file.write('# ' + '=' * 140 + '\n')
+        return not (unmatched_ref or unmatched_cur)
+
+    def write_report_summary(self, rep_file, comparison_logger):
+        """Writes the number of compared, matched and mismatched device pairs
+        and the mismatch count of every property to report file"""
+        num_pairs = self.pair_counts['matched'] + self.pair_counts['mismatched']
+        comparison_logger.info("%d device pair(s) compared, %d matched, %d mismatched",
+                               num_pairs, self.pair_counts['matched'],
+                               self.pair_counts['mismatched'])
+        rep_file.write(f"# SUMMARY: {num_pairs} device pair(s) compared, "
+                       f"{self.pair_counts['matched']} matched, "
+                       f"{self.pair_counts['mismatched']} mismatched\n")
+        rep_file.write(f"# MISMATCHED PROPERTIES: {len(self.property_mismatches)}\n")
+        for param, count in self.property_mismatches.most_common():
+            rep_file.write(f"# {param + ' = ' + str(count):>85}\n")
+        rep_file.write('# ' + '=' * 140 + '\n')
+
+    def create_rule_checker(self) -> RuleChecker:
+        """
+        Returns
+        --------
+        rule checker for the property rules given by isotope_rules, the ped/pes
+        rule by default for icv runs. Rules on ignored properties are dropped"""
+        rules = self.isotope_rules
+        if not rules and self.lvs_tool_name == 'icv':
+            rules = parse_rules(ICV_DEFAULT_RULES)
+        return RuleChecker(rules, self.exclude_list)
+
     def ped_pes_check(self) -> bool:
         """
-        performs ped/pes values check for spf file generated in current run
+        performs property rule check (ped/pes values by default) for spf file
+        generated in current run. The result of the check done while comparing
+        instances is reused, the spf file is only parsed again without it
 
         Returns
         --------
-        True or False based on ped and pes values """
-
-        if "ped" and "pes" in self.exclude_list:
-            ped_pes_flag = True
-            logging.info("ped_pes_check not performed as ped and pes are to be ignored")
-        else:
-            ins_sec_data = self.get_spf_instance_data(self.test_spf_filepath)
-            try:
-                ped_pes_flag = True
-                for _, dev in enumerate(ins_sec_data):
-                    if "ped" in dev:
-                        if dev["ped"] == "0.001u" or dev["pes"] == "0.001u":
-                            ped_pes_flag = False
-            except Exception as error:
-                logging.exception(("Exception at %s:", error))
-                raise error
-        return ped_pes_flag
+        True or False based on property values """
+
+        try:
+            if self.rule_checker is None or not self.rule_checker.checked:
+                self.rule_checker = self.create_rule_checker()
+                if self.rule_checker.rules:
+                    for _ in self.rule_checker.watch(iter_spf_devices(self.test_spf_filepath)):
+                        pass
+            if not self.rule_checker.rules:
+                logging.info("Property rule check not performed as no rules apply")
+            self.rule_checker.log_results()
+        except Exception as error:
+            logging.exception(("Exception at %s:", error))
+            raise error
+        return self.rule_checker.passed
 
     def generate_netlist_convert(self):
         """ Creates netlist convert file in rundir
@@ -255,78 +709,40 @@ class Isotope:
                         dev_path = f'{self.kit.root}/libraries/prim/lnf/common/{self.library}'
                     else:
                         dev_path = f'{self.kit.root}/libraries/prim/lnf/{self.library}'
-
-                    pattern = re.compile(r'[n/p][hp]')
-                    dev_list = [dire for dire in os.listdir(dev_path) if
-                                os.path.isdir(os.path.join(dev_path, dire))
-                                and re.match(pattern, dire)]
-                    netlist.write(f'envSetVal("asimenv.startup" '
-                                  f'"projectDir" \'string "{self.out_dir}/simulation")\n')
-                    counter = 0
-                    for dev in dev_list:
-                        if counter == 0:
-                            netlist.write("foreach(cell list(")
-                        netlist.write(f'"{dev}" ')
-                        counter = counter + 1
-                        if counter == 10:
-                            netlist.write(f') cdfIdUser=cdfCreateUserCellCDF(ddGetObj('
-                                          f'{self.library} cell))'
-                                          f' cdfIdBase=cdfGetBaseCellCDF(ddGetObj("{self.library}"'
-                                          f' cell)) cdfIdUser->simInfo '
-                                          f'= list(nil spectre list(nil instParameters '
-                                          f'append(cdfIdBase->simInfo->spectre->'
-                                          f'instParameters \'(llx lly urx ury)))))\n')
-                            counter = 0
-                    if counter > 0:
-                        netlist.write(f') cdfIdUser=cdfCreateUserCellCDF(ddGetObj'
-                                      f'({self.library} cell)) cdfIdBase=cdfGetBaseCellCDF'
-                                      f'(ddGetObj("{self.library}" cell)) cdfIdUser->'
-                                      f'simInfo = list(nil spectre list(nil instParameters'
-                                      f' append(cdfIdBase->simInfo->spectre->'
-                                      f'instParameters \'(llx lly urx ury)))))\n')
+                    cdf_update = (f') cdfIdUser=cdfCreateUserCellCDF(ddGetObj('
+                                  f'{self.library} cell))'
+                                  f' cdfIdBase=cdfGetBaseCellCDF(ddGetObj("{self.library}"'
+                                  f' cell)) cdfIdUser->simInfo '
+                                  f'= list(nil spectre list(nil instParameters '
+                                  f'append(cdfIdBase->simInfo->spectre->'
+                                  f'instParameters \'(llx lly urx ury)))))\n')
                 else:
                     if self.kit.process == "1278":
                         dev_path = f'{self.kit.root}/libraries' \
                                    f'/prim/pcell/common/{self.library}'
                     else:
                         dev_path = f'{self.kit.root}/libraries/prim/pcell/{self.library}'
-
-                    pattern = re.compile(r'[n/p][hp]')
-                    dev_list = [dire for dire in os.listdir(dev_path) if
-                                os.path.isdir(os.path.join(dev_path, dire))
-                                and re.match(pattern, dire)]
-
-                    netlist.write(f'envSetVal("asimenv.startup" '
-                                  f'"projectDir" \'string "{self.out_dir}/simulation")\n')
-                    counter = 0
-                    for dev in dev_list:
-                        if counter == 0:
-                            netlist.write("foreach(cell list(")
-                        netlist.write(f'"{dev}" ')
-                        counter = counter + 1
-                        if counter == 10:
-                            netlist.write(f') cdfIdUser=cdfCreateUserCellCDF'
-                                          f'(ddGetObj("{self.library}" cell)) '
-                                          f'cdfIdBase=cdfGetBaseCellCDF'
-                                          f'(ddGetObj("{self.library}" cell)) '
-                                          f'cdfIdUser->simInfo = cdfIdBase->simInfo '
-                                          f'cdfIdUser->simInfo->spectre->instParameters = '
-                                          f'append(cdfIdBase->simInfo->'
-                                          f'spectre->instParameters \'(llx lly urx ury)))\n')
-                            counter = 0
-                    if counter > 0:
-                        netlist.write(f') cdfIdUser=cdfCreateUserCellCDF'
-                                      f'(ddGetObj("{self.library}" cell)) '
-                                      f'cdfIdBase=cdfGetBaseCellCDF'
-                                      f'(ddGetObj("{self.library}" cell)) '
-                                      f'cdfIdUser->simInfo = cdfIdBase->simInfo '
-                                      f'cdfIdUser->simInfo->spectre->instParameters = '
-                                      f'append(cdfIdBase->simInfo->'
-                                      f'spectre->instParameters \'(llx lly urx ury)))\n')
+                    cdf_update = (f') cdfIdUser=cdfCreateUserCellCDF'
+                                  f'(ddGetObj("{self.library}" cell)) '
+                                  f'cdfIdBase=cdfGetBaseCellCDF'
+                                  f'(ddGetObj("{self.library}" cell)) '
+                                  f'cdfIdUser->simInfo = cdfIdBase->simInfo '
+                                  f'cdfIdUser->simInfo->spectre->instParameters = '
+                                  f'append(cdfIdBase->simInfo->'
+                                  f'spectre->instParameters \'(llx lly urx ury)))\n')
+
+                dev_list = self.prim_cache.devices(dev_path)
+                netlist.write(f'envSetVal("asimenv.startup" '
+                              f'"projectDir" \'string "{self.out_dir}/simulation")\n')
+                for idx in range(0, len(dev_list), 10):
+                    netlist.write("foreach(cell list(")
+                    netlist.write(''.join(f'"{dev}" ' for dev in dev_list[idx:idx + 10]))
+                    netlist.write(cdf_update)
                 netlist.write("simulator(\'spectre)\n")
-                netlist.write(f'design("{getpass.getuser()}_p{self.kit.dot}" '
-                              f'"{self.cell_name}" "{self.flow}.{self.skew}.{self.temperature}")\n')
-                netlist.write("createNetlist()\n")
+                for cell, view in self.oa_views:
+                    netlist.write(f'design("{getpass.getuser()}_p{self.kit.dot}" '
+                                  f'"{cell}" "{view}")\n')
+                    netlist.write("createNetlist()\n")
                 netlist.write("exit()\n")
         except Exception as error:
             logging.exception("Error while running spectre netlist - %s", error)
@@ -344,7 +760,10 @@ class Isotope:
         try:
             oa_lib = os.path.join(self.run_directory, f'{getpass.getuser()}_p{self.kit.dot}')
             if Path(os.path.join(self.extract_dir, 'oa_lib')).exists():
-                shutil.copytree(os.path.join(self.extract_dir, 'oa_lib'), oa_lib)
+                stage_mode = stage_tree(os.path.join(self.extract_dir, 'oa_lib'), oa_lib,
+                                        self.oa_stage_mode,
+                                        [os.path.join(cell, view) for cell, view in self.oa_views])
+                logging.info("Staged oa library in %s with %s", oa_lib, stage_mode)
             tool = Virtuoso(kit=self.kit,
                             cmd='virtuoso',
                             options=f'-nograph -replay {self.out_dir}/netlist_convert'
@@ -361,92 +780,155 @@ class Isotope:
             logging.exception("Error while running spectre netlist - %s", error)
             raise error
 
-    def modify_scsfile(self, oa_file):
-        """This Function creates a modified form of the oa file generated"""
-        try:
-            input_modified_scs = Path(f'{self.out_dir}/input_modified.scs')
-            logging.info("modifying oa view file")
-            with open(oa_file, 'r', encoding='utf8') as scs_file:
-                with open(input_modified_scs, 'w', encoding='utf8') as input_modified_scs:
-                    oa_lines = scs_file.readlines()
-                    mod_lines = ''.join(oa_lines)
-                    final_data = mod_lines.replace('\\\n', '')
-                    input_modified_scs.write('\n' + final_data)
-        except Exception as error:
-            logging.exception("Exception at: %s", error)
-            raise error
+    @staticmethod
+    def modify_scsfile(oa_file):
+        """This Function streams the oa file generated with line continuations
+        joined, one logical line at a time"""
+        logging.info("modifying oa view file")
+        return iter_logical_lines(oa_file)
+
+    def parse_oa_views(self, oa_views) -> list:
+        """
+        Args
+        -----
+        list or comma separated string of <flow>.<skew>.<temp> views of the cell,
+        <cell>:<flow>.<skew>.<temp> for views of other cells
+
+        Returns
+        -------
+        list of (cell, view) pairs netlisted in one virtuoso session, the view of
+        the flow, skew and temperature of the run by default
+        """
+        if not oa_views:
+            return [(self.cell_name, f'{self.flow}.{self.skew}.{self.temperature}')]
+        if isinstance(oa_views, str):
+            oa_views = oa_views.split(',')
+        views = []
+        for spec in (str(spec).strip() for spec in oa_views):
+            if spec:
+                cell, _, view = spec.rpartition(':')
+                views.append((cell or self.cell_name, view))
+        return views
 
     def oa_isotope(self) -> bool:
-        """Function to compare oa and spf files"""
-        if not os.path.isfile(self.reference_spf_filepath):
-            raise Exception("Test file is empty/not found")
+        """Function to compare oa and spf files. All the oa views are netlisted in
+        one virtuoso session, the netlist of every view is then compared with the
+        reference spf file. reference_spf_filepath may hold {cell}, {flow},
+        {skew} and {temperature} fields filled in from the view"""
+        reference_spf = self.reference_spf_filepath
+        batch = len(self.oa_views) > 1
+        references = []
+        for cell, view in self.oa_views:
+            flow, skew, temperature = (view.split('.') + ['', ''])[:3]
+            references.append(reference_spf.format(cell=cell, flow=flow, skew=skew,
+                                                   temperature=temperature))
+            if not os.path.isfile(references[-1]):
+                raise Exception("Test file is empty/not found")
         self.generate_netlist_convert()
         self.generate_oa()
-        oa_file = Path(f'{self.out_dir}/simulation/{self.cell_name}'
-                       f'/spectre/{self.flow}.{self.skew}.{self.temperature}/netlist/input.scs')
-        if oa_file.is_file():
-            self.modify_scsfile(oa_file)
-            if self.compare_oa_spf_instances():
-                logging.info("lpe_oa_isotope : Pass")
-                oaspf_flag = True
-            else:
-                logging.error("lpe_oa_isotope : Fail")
-                oaspf_flag = False
-        else:
-            oaspf_flag = False
-            logging.error("OA netlist is not generated, refer to netlist_convert.log")
-        return oaspf_flag
-
-    def compare_oa_spf_instances(self) -> bool:
+        view_flags = []
+        try:
+            for (cell, view), reference in zip(self.oa_views, references):
+                self.reference_spf_filepath = reference
+                oa_file = Path(f'{self.out_dir}/simulation/{cell}'
+                               f'/spectre/{view}/netlist/input.scs')
+                rep_dir = os.path.join(self.out_dir, cell, view) if batch else self.out_dir
+                if oa_file.is_file():
+                    os.makedirs(rep_dir, exist_ok=True)
+                    if self.compare_oa_spf_instances(oa_file, rep_dir):
+                        logging.info("lpe_oa_isotope %s %s : Pass", cell, view)
+                        view_flags.append(True)
+                    else:
+                        logging.error("lpe_oa_isotope %s %s : Fail", cell, view)
+                        view_flags.append(False)
+                    self.write_results_summary(view_flags[-1], os.path.join(rep_dir, RESULTS_FILE),
+                                               oa_cell=cell, oa_view=view, oa_file=str(oa_file))
+                else:
+                    view_flags.append(False)
+                    logging.error("OA netlist of %s %s is not generated, refer to "
+                                  "netlist_convert.log", cell, view)
+        finally:
+            self.reference_spf_filepath = reference_spf
+        return all(view_flags)
+
+    def compare_oa_spf_instances(self, oa_file, rep_dir=None) -> bool:
         """Args
         ---------
-        spf file and oa file that needs to compared for devices
-        and output directory to generate report file
+        oa netlist file that needs to compared with the spf file for devices
+        and directory of the report file, output directory by default
 
         Returns
         --------
         Performs devices comparison for the input files and
         returns True if they are 100% match"""
         try:
-            oa_file = Path(f'{self.out_dir}/input_modified.scs')
-            dev_data_ref = self.get_spf_instance_data(self.reference_spf_filepath)
             dev_data_cur = self.get_oa_dev_data(oa_file)
-            if len(dev_data_cur) == len(dev_data_ref):
-                self.exclude_list.update(["si_w", "si_l", "x", "y", "angle", "PROPERTY"])
-                rep_file = os.path.join(self.out_dir, "isotope_report.txt")
-                logging.info("Generating report file...")
-                with open(rep_file, 'w', encoding='utf8') as rep_file:
-                    rep_file.write("ISOTOPE COMPARISON REPORT:\n\n")
-                    rep_file.write("LIST OF PARAMETERS IGNORED DURING COMPARISON:")
-                    for item in self.exclude_list:
-                        rep_file.write(item + ' ')
-                    rep_file.write("\n\nCOMPARISON DETAILS:\n\n")
-                    comp_res = True
-                    for _, ref_dev in enumerate(dev_data_ref):
-                        for _, cur_dev in enumerate(dev_data_cur):
-                            if ref_dev.get("llx") == cur_dev.get("llx") \
-                                    and ref_dev.get("lly") == cur_dev.get("lly"):
-                                rep_file.write(f"{'SPF INSTANCE':>63}{'OA INSTANCE':>50}\n")
-                                rep_file.write(f'{"PROPERTY":51}{ref_dev.get("PROPERTY"):<51}'
-                                               f'{cur_dev.get("PROPERTY"):<51}{"COMPARISON":<50}\n')
-                                for param in ref_dev:
-                                    if param not in self.exclude_list:
-                                        if ref_dev.get(param) == cur_dev.get(param):
-                                            rep_file.write(f'{param:51}{ref_dev.get(param):<51}'
-                                                           f'{cur_dev.get(param):<51}{"MATCH":<51}\n')
-                                        else:
-                                            rep_file.write(
-                                                f'{param:51}{ref_dev.get(param):<51}'
-                                                f'{cur_dev.get(param):<51}{"MISMATCH":<51}\n')
-                                            comp_res = False
-                                rep_file.write('-' * 160 + '\n')
-                logging.info("Comparison completed, refer to report file in output directory")
-            else:
-                logging.info("Number of instances did not match for the files")
-                comp_res = False
+            oa_index = SpatialIndex(dev_data_cur, OA_KEY_PROPS, self.oa_coord_tolerance)
+            self.exclude_list.update(["si_w", "si_l", "x", "y", "angle", "PROPERTY"])
+            rep_file = os.path.join(rep_dir or self.out_dir, "isotope_report.txt")
+            logging.info("Generating report file...")
+            self.open_results(rep_dir or self.out_dir)
+            with open(rep_file, 'w', encoding='utf8') as rep_file:
+                rep_file.write("ISOTOPE COMPARISON REPORT:\n\n")
+                rep_file.write("LIST OF PARAMETERS IGNORED DURING COMPARISON:")
+                for item in self.exclude_list:
+                    rep_file.write(item + ' ')
+                rep_file.write("\n\nCOMPARISON DETAILS:\n\n")
+                comp_res = True
+                num_ref = 0
+                unmatched_ref = []
+                for ref_dev in self.iter_reference_devices():
+                    num_ref += 1
+                    cur_dev = oa_index.query(ref_dev)
+                    if cur_dev is None:
+                        unmatched_ref.append(ref_dev)
+                        continue
+                    rep_file.write(f"{'SPF INSTANCE':>63}{'OA INSTANCE':>50}\n")
+                    rep_file.write(f'{"PROPERTY":51}{ref_dev.get("PROPERTY"):<51}'
+                                   f'{cur_dev.get("PROPERTY"):<51}{"COMPARISON":<50}\n')
+                    mismatched = []
+                    for param in ref_dev:
+                        if param not in self.exclude_list:
+                            if param in OA_KEY_PROPS or \
+                                    self.comparator.equal(param, ref_dev.get(param),
+                                                          cur_dev.get(param)):
+                                rep_file.write(f'{param:51}{ref_dev.get(param):<51}'
+                                               f'{cur_dev.get(param):<51}{"MATCH":<51}\n')
+                            else:
+                                rep_file.write(
+                                    f'{param:51}{ref_dev.get(param):<51}'
+                                    f'{cur_dev.get(param):<51}{"MISMATCH":<51}\n')
+                                mismatched.append(param)
+                                comp_res = False
+                    self.pair_counts['mismatched' if mismatched else 'matched'] += 1
+                    self.property_mismatches.update(mismatched)
+                    if mismatched and self.results is not None:
+                        self.results.mismatch(ref_dev, cur_dev, mismatched)
+                    rep_file.write('-' * 160 + '\n')
+                unmatched_cur = oa_index.remaining()
+                if num_ref != len(dev_data_cur):
+                    logging.info("Number of instances did not match for the files")
+                    comp_res = False
+                if unmatched_ref or unmatched_cur:
+                    comp_res = False
+                self.pair_counts['unmatched_golden'] += len(unmatched_ref)
+                self.pair_counts['unmatched_sample'] += len(unmatched_cur)
+                for title, netlist, devs in (("UNMATCHED SPF INSTANCE", "golden", unmatched_ref),
+                                             ("UNMATCHED OA INSTANCE", "sample", unmatched_cur)):
+                    for dev in devs:
+                        if self.results is not None:
+                            self.results.unmatched(netlist, dev)
+                        rep_file.write(f'{title:51}{dev.get("PROPERTY"):<51}'
+                                       f'{"llx = " + str(dev.get("llx")):<51}'
+                                       f'{"lly = " + str(dev.get("lly")):<51}\n')
+                    if devs:
+                        rep_file.write('-' * 160 + '\n')
+            logging.info("Comparison completed, refer to report file in output directory")
         except Exception as error:
             logging.exception("Exception at: %s", error)
             raise error
+        finally:
+            self.close_results()
         return comp_res
 
     @staticmethod
@@ -457,29 +939,11 @@ class Isotope:
         list of lines where each line has device data collected from spf/oa view files
         Returns
         -------
-        list of dictionaries where each dict has properties and values from device data
+        list of read only mappings where each mapping has properties and values from device data
         """
         try:
             if ins_list:
-                ins_data = []
-                for dev_line in ins_list:
-                    dev_line = dev_line.split()
-                    if len(dev_line) > 2:
-                        dev_prop = dev_line.copy()
-                        for prop in dev_line:
-                            if "=" in prop:
-                                counter = dev_line.index(prop)
-                                del dev_prop[0:counter]
-                                dev_prop.insert(0, "PROPERTY=" + dev_line[0])
-                                dev_prop.insert(1, "device_type=" + dev_line[counter - 1])
-                                dev_prop.insert(2, "num_of_ports=" + str(counter - 2))
-                                break
-                        dev_data = {}
-                        for val in dev_prop:
-                            if val:
-                                tmp = val.split("=", 1)
-                                dev_data[tmp[0]] = tmp[1]
-                        ins_data.append(dev_data)
+                ins_data = list(DeviceInterner().intern_all(iter_devices(ins_list)))
             else:
                 raise Exception("instance section lines are not collected from spf file")
             assert len(ins_data) != 0
@@ -498,23 +962,20 @@ class Isotope:
         Returns
         -------
         This method returns data from instance section of the input file in the form of a list.
-        Each list item contains lines instance section from input spf file
+        Each list item is a read only mapping of device properties sharing repeated property sets
+        with other devices, use iter_spf_devices to stream them instead
         """
 
         try:
-            ins_list = []
-            ins_data = []
-            flag_ins = False
-            with open(spf_file, "r", encoding='utf8') as file:
-                for line in file:
-                    if "Instance Section" in line:
-                        flag_ins = True
-                        continue
-                    if flag_ins:
-                        ins_list.append(line.strip("\n"))
-            if flag_ins:
-                ins_data = self.org_instance_data(ins_list)
-                logging.info("Device data is found in input spf file")
+            if self.isotope_workers > 1:
+                ins_data = []
+                for chunk in iter_spf_device_chunks(spf_file, self.isotope_workers):
+                    ins_data.extend(self.interner.intern_all(chunk))
+            else:
+                ins_data = list(self.interner.intern_all(iter_spf_devices(spf_file)))
+            if ins_data:
+                logging.info("Device data is found in input spf file, %d device(s) share %d"
+                             " property set(s)", len(ins_data), len(self.interner.values))
             return ins_data
 
         except Exception as error:
@@ -525,25 +986,20 @@ class Isotope:
         """
         Args
         -----
-       spf file
+        oa netlist file
 
         Returns
         -------
         This method returns data from instance section of the input file in the
-        form of a list. Each list item contains lines of device data from input scs file
-       """
+        form of a list. Each list item is a dict of device properties of an instance
+        placed in the layout (llx parameter) or of a djnw diode
+        """
 
         try:
-            ins_lines = []
-            dev_data = []
-            flag_ins = False
-            with open(oa_file, "r", encoding='utf8') as file:
-                for line in file:
-                    if "llx" in line or "djnw" in line:
-                        ins_lines.append(line.strip("\n"))
-                        flag_ins = True
-            if flag_ins:
-                dev_data = self.org_instance_data(ins_lines)
+            dev_data = [self.interner.intern(instance_device(instance))
+                        for instance in iter_instances(self.modify_scsfile(oa_file))
+                        if "llx" in instance.params or "djnw" in instance.model]
+            if dev_data:
                 logging.info("Device data found in input oa file")
             return dev_data
 
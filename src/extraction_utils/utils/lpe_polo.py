@@ -3,7 +3,6 @@
 import logging
 import getpass
 import os
-import glob
 import shutil
 import re
 from pathlib import Path
@@ -13,10 +12,18 @@ from waldo.tool.virtuoso import Virtuoso
 from waldo.tool.ocean import Ocean
 from pdk_environment.envsetup.pdkconfig import get_layer_stack
 from .helpers import Helpers
+from .model_index import KitFileIndex
+from .model_rules import resolve_model_includes
+from .netlist_cache import NetlistCache
+from .ocean_pool import EXIT_CALL, POOL_EXIT_CALL, get_pool
+from .prelay_cache import PrelayCache, file_digest, fingerprint, netlist_digest
+from .spf_index import SpfIndex
 
 class LpePolo:
     """ Module to run post and prelayout simulation"""
 
+    _model_data_memo = {}
+
     def __init__(self, **kwargs: dict):
         """ Initialize Simulation
 
@@ -66,11 +73,22 @@ class LpePolo:
             raise error
         
 
-        models_dir_string = self.kit.root
-        models_dir_string += "/models"
-
-        model_library = os.path.join(models_dir_string, '**', '*.scs')
-        self.model_files = glob.glob(model_library, recursive=True)
+        self.model_index = KitFileIndex(self.kit.root, 'models', '*.scs',
+                                        self._kwargs.get('kit_index_dir'))
+        self.model_files = self.model_index.files
+
+        self.ocean_pool = None
+        if self._kwargs.get('ocean_pool_size'):
+            self.ocean_pool = get_pool(self._kwargs.get('ocean_pool_size'),
+                                       self._kwargs.get('ocean_pool_backend') or 'ocean',
+                                       self._kwargs.get('ocean_pool_dir'))
+        self.exit_call = POOL_EXIT_CALL if self.ocean_pool else EXIT_CALL
+        self.prelay_cache = None
+        if self._kwargs.get('prelay_cache', True):
+            self.prelay_cache = PrelayCache(self._kwargs.get('prelay_cache_dir'))
+        self.netlist_cache = None
+        if self._kwargs.get('netlist_cache', True):
+            self.netlist_cache = NetlistCache(self._kwargs.get('netlist_cache_dir'))
 
         self.layerstack = get_layer_stack(self.kit_name)
         if self._kwargs.get('lvs_tool_name') == 'icv':
@@ -94,9 +112,22 @@ class LpePolo:
         if (Path(self.run_dir).absolute()/'netlist_convert').exists():
             os.remove(Path(self.run_dir).absolute()/'netlist_convert')
 
+        netlist_dir = f"{self.run_dir}/simulation/{self.cell_name}/spectre/schematic/netlist"
+        convert_template = str(Path(__file__).parent / 'templates' / 'netlist_convert.j2')
+        netlist_key = None
+        if self.netlist_cache is not None:
+            netlist_key = self.netlist_cache.key(self.lib_name, self.cell_name, self.cds_lib,
+                                                 kit=[str(self.kit.root)] + self.model_index.stamp,
+                                                 tech_opt=self.tech_opt,
+                                                 template=file_digest(convert_template))
+            if netlist_key is not None and self.netlist_cache.materialize(netlist_key, netlist_dir):
+                logging.info('Reusing spectre netlist %s of %s/%s', netlist_key, self.lib_name,
+                             self.cell_name)
+                return 0, ''
+
         logging.info('Generating netlist convert file...')
         settings = {
-            'src_file': str(Path(__file__).parent / 'templates' / 'netlist_convert.j2'),
+            'src_file': convert_template,
             'dst_file': str(Path(self.run_dir) / 'netlist_convert'),
             'values':{
                 'simualtion_path' :str(Path(self.run_dir) / 'simulation') ,
@@ -117,6 +148,8 @@ class LpePolo:
                     component_type ='pcell',
                     run_dir=self.run_dir)
             netlist_return_code, netlist_out, _ = tool.run()
+            if netlist_key is not None and netlist_return_code == 0 and Path(f"{netlist_dir}/netlist").exists():
+                self.netlist_cache.store(netlist_key, netlist_dir)
             return netlist_return_code, netlist_out
         except Exception as error:
             logging.exception("Error while running spectre netlist - %s", error)
@@ -202,11 +235,9 @@ class LpePolo:
         logging.info("Preparing Sub Circuit(subckt) teminal values from spf file....")
         subckt_terminals = []
         try:
-            with open(self.spf_file, 'r', encoding='utf8') as file:
-                for line in file.readlines():
-                    if '.SUBCKT' in line:
-                        subckt_list = line.split()
-                        subckt_terminals.extend(subckt_list)
+            for line in SpfIndex(self.spf_file).subckt_lines():
+                subckt_list = line.split()
+                subckt_terminals.extend(subckt_list)
         except Exception as error:
             logging.exception("Error while generating subcircuit list from spf file %s", error)
             raise error
@@ -215,134 +246,24 @@ class LpePolo:
         return subckt_terminals
 
     def _get_model_data(self) -> list:
-        """ Returns the list of model files under the given kit
+        """ Returns the list of model files under the given kit, resolved once
+        per kit, tech_opt and skew
         Returns
         -------
         modelfiles_data: list
             list of model files data
         """
-        # This block will return the list of model files in the kit root based on the logic
-        # Logic is ported from perl script. Code is working fine and producing expected output
-
         process = self.kit.tech
-        logging.info("Generating modelfile list for process %s",process)
-        modelfiles_data = []
-        if process == "1271":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                if ((re.search('devpar', all_file_list[-1])) \
-                    or (re.search('aging', all_file_list[-2]))):
-                    continue
-                if any(True for val in ["primtemplate.scs", "mfc.scs", "ind.scs", "ind_scl.scs",
-                "indwrapper_scl.scs", "var.scs"] if re.search(val, all_file_list[-1])):
-                    continue
-                if all_file_list[-1] == "esd.scs":
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                else:
-                    modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-
-        if process == "1273":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                if re.search('aging', all_file_list[-2]):
-                    continue
-                if re.search("intel73custom.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search("p1273_6_halftcnr.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search("intel73indwrapper.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search("intel73mfccustom.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search("intel73mfcwrapper.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search("intel73prim.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                else:
-                    modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-
-        if process == "1222":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                if re.search(self.layerstack[self.tech_opt], file):
-                    if re.search("common", all_file_list[-2]):
-                        continue
-                    if re.search(f"p1222_{self.kit.dot}.scs", file):
-                        modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-                elif re.match(f"^{self.layerstack[self.tech_opt]}", file):
-                    if re.search('aging', file):
-                        continue
-                    if (re.search('var_be.scs', all_file_list[-1]) \
-                        or re.search('var_fe.scs', all_file_list[-1])):
-                        continue
-                    if re.search("intel73custom.scs",all_file_list[-1]):
-                        modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                    elif re.search(r"p1222_[0-9]+_degpar.scs",all_file_list[-1]):
-                        modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                    elif re.search(r"p1222_[0-9]+_eos.scs",all_file_list[-1]):
-                        modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                    elif re.search("bitcells.scs",all_file_list[-1]):
-                        modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                    else:
-                        modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-
-        if process == "1272":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                if re.search('aging', all_file_list[-3]):
-                    continue
-                if re.search('sram', all_file_list[-3]):
-                    continue
-                if (re.search('var_be.scs', all_file_list[-1]) \
-                    or re.search('var_fe.scs', all_file_list[-1])):
-                    continue
-                if re.search("c8lib6.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search(r"p1222_[0-9]+_degpar.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                elif re.search(r"p1222_[0-9]+_eos.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                else:
-                    modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-
-        if process == "1276":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                if re.search('aging', all_file_list[-3]):
-                    continue
-                if re.search('sram', all_file_list[-3]):
-                    continue
-                if (re.search('var_be.scs', all_file_list[-1]) \
-                    or re.search('var_fe.scs', all_file_list[-1])):
-                    continue
-                if re.search("intel76custom.scs",all_file_list[-1]):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                else:
-                    modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-
-        if process == "1278":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                #To Do: Ned to work
-                if re.search(self.layerstack[self.tech_opt], file):
-                    modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-                elif re.search("intel78custom.scs",file):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                else:
-                    continue
-
-        if process == "1277":
-            for file in self.model_files:
-                all_file_list = file.split('/')
-                #To Do: Need to work
-                if re.search(self.layerstack[self.tech_opt], file):
-                    modelfiles_data.append(f"    '(\"{file}\" \"tttt\")\n")
-                elif re.search("intel77custom.scs",file):
-                    modelfiles_data.append(f"    '(\"{file}\" \"\")\n")
-                else:
-                    continue
-
-        return modelfiles_data
+        key = (str(self.kit.root), self.tech_opt, self.skew, tuple(self.model_index.stamp))
+        modelfiles_data = self._model_data_memo.get(key)
+        if modelfiles_data is None:
+            logging.info("Generating modelfile list for process %s",process)
+            values = {'dot': self.kit.dot}
+            if self.tech_opt in self.layerstack:
+                values['layerstack'] = self.layerstack[self.tech_opt]
+            modelfiles_data = resolve_model_includes(self.model_index.components(), process, values)
+            self._model_data_memo[key] = modelfiles_data
+        return list(modelfiles_data)
 
 
     def run_ro_ocean_prelay(self):
@@ -376,8 +297,8 @@ class LpePolo:
             raise RuntimeError(f'Undefined variables while setting up options: {str(undefined)}')
 
         #model file data to put in ocn script
-        modelfiles_data = self._get_model_data()
-        modelfiles_data.append(f"    '(\"{self.run_dir}/tb_prelay.scs\")\n")
+        model_includes = self._get_model_data()
+        modelfiles_data = model_includes + [f"    '(\"{self.run_dir}/tb_prelay.scs\")\n"]
 
         # generate ocn file
         logging.info("Generating tb_prelay ocn file for prelayput simulation.")
@@ -391,26 +312,49 @@ class LpePolo:
                 'outfile_handle': f"{self.run_dir}/{self.cell_name}.out",
                 'testcaseval': f"{self.cell_name} (prelay)",
                 'net_name1': terminal_netlist[1],
-                'net_name2': subckt_terminal[3]
+                'net_name2': subckt_terminal[3],
+                'exit_call': self.exit_call
             }
         }
         _, undefined = template.generate(**settings)
         if len(undefined) != 0:
             raise RuntimeError(f'Undefined variables while setting up options: {str(undefined)}')
 
+        out_file = Path(f"{self.run_dir}/{self.cell_name}.out")
+        prelay_key = None
+        if self.prelay_cache is not None:
+            prelay_key = fingerprint(
+                netlist=netlist_digest(netlist_path),
+                model_files=model_includes,
+                temperature=str(self.temperature),
+                skew=self.skew,
+                testbench=file_digest(tb_prelay_settings['dst_file']),
+                template=file_digest(settings['src_file']),
+                values={name: settings['values'][name] for name in ('testcaseval', 'net_name1', 'net_name2')})
+            cached = self.prelay_cache.get(prelay_key)
+            if cached is not None:
+                logging.info('Reusing prelayout simulation result %s', prelay_key)
+                with open(out_file, 'a', encoding='utf8') as out:
+                    out.write(cached['out'])
+                with open(Path(f"{self.run_dir}/run_prelay.ocn.stdout"), 'w',
+                    encoding='utf8') as pre_stdout:
+                    pre_stdout.write(cached['stdout'])
+                return cached['exitcode']
+
         #running prelayout simulation
         logging.info('Preparing for prelayout simulation..')
+        out_size = out_file.stat().st_size if out_file.exists() else 0
         try:
-            tool = Ocean(kit=self.kit,
-                    cmd='ocean',
-                    options= f"-noxshm -log {self.run_dir}/run_prelay.ocn.log"\
-                            f" -replay {self.run_dir}/run_prelay.ocn",
-                    run_dir=self.run_dir)
-            
-            prelay_exitcode, prelay_stdout, _ = tool.run()
+            prelay_exitcode, prelay_stdout = self.run_ocean('run_prelay.ocn')
         except Exception as error:
             logging.exception("Error while running pre layout simulation: %s", error)
             raise error
+        if prelay_key is not None and prelay_exitcode == 0 and out_file.exists():
+            with open(out_file, 'rb') as out:
+                out.seek(out_size)
+                prelay_out = out.read().decode('utf8')
+            if 'ERROR' not in prelay_out:
+                self.prelay_cache.put(prelay_key, prelay_exitcode, ''.join(prelay_stdout), prelay_out)
         logging.info('Writing standard output in run_prelay.ocn.stdout')
         with open(Path(f"{self.run_dir}/run_prelay.ocn.stdout"), 'w',
             encoding='utf8') as pre_stdout:
@@ -472,7 +416,8 @@ class LpePolo:
                 'outfile_handle': f"{self.run_dir}/{self.cell_name}.out",
                 'testcaseval': f"{self.cell_name} (polo)",
                 'net_name1': terminal_netlist[1],
-                'net_name2': subckt_terminal[3]
+                'net_name2': subckt_terminal[3],
+                'exit_call': self.exit_call
             }
         }
         _, undefined = template.generate(**settings)
@@ -483,12 +428,7 @@ class LpePolo:
         #running post simulation
         logging.info('Preparing post layout simulation..')
         try:
-            tool = Ocean(kit=self.kit,
-                    cmd='ocean',
-                    options=f"-noxshm -log {self.run_dir}/run_polo.ocn.log" \
-                        f" -replay {self.run_dir}/run_polo.ocn",
-                    run_dir=self.run_dir)
-            polo_exitcode, polo_stdout, _ = tool.run()
+            polo_exitcode, polo_stdout = self.run_ocean('run_polo.ocn')
         except Exception as error:
             logging.exception('Error while running post layout simulation: %s', error)
             raise error
@@ -525,7 +465,8 @@ class LpePolo:
                 'outfile_handle': f"{self.run_dir}/{self.cell_name}.out",
                 'testcaseval': f"{self.cell_name} (oa)",
                 'net_name1': terminal_netlist[1],
-                'net_name2': subckt_terminal[3]
+                'net_name2': subckt_terminal[3],
+                'exit_call': self.exit_call
             }
         }
         _, undefined = template.generate(**settings)
@@ -535,12 +476,7 @@ class LpePolo:
         #running oa simulation
         logging.info('Preparing for post layout simulation of oa view..')
         try:
-            tool = Ocean(kit=self.kit,
-                    cmd='ocean',
-                    options=f"-noxshm -log {self.run_dir}/run_oa.ocn.log" \
-                        f" -replay {self.run_dir}/run_oa.ocn",
-                    run_dir=self.run_dir)
-            polo_oa_exitcode, polo_stdout, _ = tool.run()
+            polo_oa_exitcode, polo_stdout = self.run_ocean('run_oa.ocn')
         except Exception as error:
             logging.exception("Error while running oa simulation: %s", error)
             raise error
@@ -579,7 +515,8 @@ class LpePolo:
                 'outfile_handle': f"{self.run_dir}/{self.cell_name}.out",
                 'testcaseval': f"{self.cell_name} (smc-oa)",
                 'net_name1': terminal_netlist[1],
-                'net_name2': subckt_terminal[3]
+                'net_name2': subckt_terminal[3],
+                'exit_call': self.exit_call
             }
         }
         _, undefined = template.generate(**settings)
@@ -589,12 +526,7 @@ class LpePolo:
         #running  smc oa simulation
         logging.info('Preparing smc oa simulation for smc oa view...')
         try:
-            tool = Ocean(kit=self.kit,
-                    cmd='ocean',
-                    options=f"-noxshm -log {self.run_dir}/run_smc_oa.ocn.log" \
-                        f" -replay {self.run_dir}/run_smc_oa.ocn",
-                    run_dir=self.run_dir)
-            smc_oa_exitcode, smc_oa_stdout, _ = tool.run()
+            smc_oa_exitcode, smc_oa_stdout = self.run_ocean('run_smc_oa.ocn')
         except Exception as error:
             logging.exception("Error while running oa simulation: %s", error)
             raise error
@@ -605,6 +537,27 @@ class LpePolo:
 
         return smc_oa_exitcode
 
+    def run_ocean(self, script_name: str) -> tuple:
+        """ Replays an ocean script of the run directory, in a warm session of
+        the ocean pool when ocean_pool_size is set
+
+        returns
+        --------
+            exitcode : int
+                exit status of the script, 0 for successfull
+            stdout : str
+                standard output of the script
+        """
+        script = f"{self.run_dir}/{script_name}"
+        if self.ocean_pool is not None:
+            return self.ocean_pool.replay(self.kit, script)
+        tool = Ocean(kit=self.kit,
+                cmd='ocean',
+                options=f"-noxshm -log {script}.log -replay {script}",
+                run_dir=self.run_dir)
+        exitcode, stdout, _ = tool.run()
+        return exitcode, stdout
+
     def run(self) -> tuple:
         """ Main method to run complete pre layout and post layout
             Returns
@@ -0,0 +1,88 @@
+"""Module to index the files of a kit directory once per kit"""
+import glob
+import hashlib
+import json
+import logging
+import os
+
+INDEX_VERSION = 1
+
+
+class KitFileIndex:
+    """Paths and path components of the files matching a pattern below a kit
+    directory. The tree is walked once, later queries are served from memory
+    or from an index file in index_dir. Indexes are invalidated when the
+    modification time of the kit root or of the indexed directory changes"""
+
+    _memo = {}
+
+    def __init__(self, root, subdir: str = 'models', pattern: str = '*.scs', index_dir=None):
+        """
+        Args
+        -----
+        root: kit root directory
+        subdir: directory below the kit root to index
+        pattern: glob pattern of the files, matched at any depth
+        index_dir: directory keeping index files between runs, optional
+        """
+        self.root = str(root)
+        self.directory = os.path.join(self.root, subdir)
+        self.pattern = pattern
+        self.key = f'{self.directory}|{pattern}'
+        self.index_file = None
+        if index_dir:
+            name = hashlib.sha1(self.key.encode('utf8')).hexdigest()
+            self.index_file = os.path.join(str(index_dir), f'kit_files_{name}.json')
+        self.stamp = self._stamp()
+        entry = self._memo.get(self.key)
+        if entry is None or entry['stamp'] != self.stamp:
+            entry = self._load()
+        if entry is None:
+            logging.info("Indexing %s files in %s", pattern, self.directory)
+            entry = {'stamp': self.stamp,
+                     'files': glob.glob(os.path.join(self.directory, '**', pattern),
+                                        recursive=True)}
+            self._save(entry)
+        self._memo[self.key] = self._entry = entry
+        self.files = entry['files']
+
+    def _stamp(self) -> list:
+        stamp = [INDEX_VERSION]
+        for path in (self.root, self.directory):
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        return stamp
+
+    def _load(self):
+        if self.index_file is None:
+            return None
+        try:
+            with open(self.index_file, 'r', encoding='utf8') as idx_file:
+                entry = json.load(idx_file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('stamp') != self.stamp:
+            logging.info("Kit file index %s is stale", self.index_file)
+            return None
+        return entry
+
+    def _save(self, entry: dict):
+        if self.index_file is None:
+            return
+        tmp_file = f'{self.index_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf8') as idx_file:
+                json.dump(entry, idx_file)
+            os.replace(tmp_file, self.index_file)
+        except OSError as error:
+            logging.warning("Could not write kit file index %s: %s", self.index_file, error)
+
+    def components(self) -> list:
+        """Returns (path, path components) pairs of the indexed files, split
+        once per kit"""
+        if 'components' not in self._entry:
+            self._entry['components'] = [(path, path.split('/')) for path in self.files]
+        return self._entry['components']
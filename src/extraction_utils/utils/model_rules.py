@@ -0,0 +1,99 @@
+"""Module with the per process rules selecting the kit model files included in
+the ocean simulations"""
+import re
+
+SKIP = None
+# path component a rule pattern is searched in, None searches the full path
+FIELDS = {'name': -1, 'dir': -2, 'parent': -3, 'path': None}
+
+# process: (rules, default section). A rule is (conditions, section), the
+# first rule whose (field, pattern) conditions all match a model file gives
+# its section, SKIP leaves the file out. Patterns are regular expressions
+# searched in the field, {layerstack} and {dot} are replaced by the kit values.
+# The logic is ported from the perl flow
+MODEL_RULES = {
+    '1271': ([
+        ((('name', 'devpar'),), SKIP),
+        ((('dir', 'aging'),), SKIP),
+        ((('name', 'primtemplate.scs|mfc.scs|ind.scs|ind_scl.scs|indwrapper_scl.scs|var.scs'),), SKIP),
+        ((('name', r'^esd\.scs$'),), ''),
+    ], 'tttt'),
+    '1273': ([
+        ((('dir', 'aging'),), SKIP),
+        ((('name', 'intel73custom.scs|p1273_6_halftcnr.scs|intel73indwrapper.scs|intel73mfccustom.scs|'
+                   'intel73mfcwrapper.scs|intel73prim.scs'),), ''),
+    ], 'tttt'),
+    '1222': ([
+        ((('path', '{layerstack}'), ('dir', 'common')), SKIP),
+        ((('path', '{layerstack}'), ('path', 'p1222_{dot}.scs')), 'tttt'),
+    ], SKIP),
+    '1272': ([
+        ((('parent', 'aging|sram'),), SKIP),
+        ((('name', 'var_be.scs|var_fe.scs'),), SKIP),
+        ((('name', 'c8lib6.scs|p1222_[0-9]+_degpar.scs|p1222_[0-9]+_eos.scs'),), ''),
+    ], 'tttt'),
+    '1276': ([
+        ((('parent', 'aging|sram'),), SKIP),
+        ((('name', 'var_be.scs|var_fe.scs'),), SKIP),
+        ((('name', 'intel76custom.scs'),), ''),
+    ], 'tttt'),
+    '1278': ([
+        ((('path', '{layerstack}'),), 'tttt'),
+        ((('path', 'intel78custom.scs'),), ''),
+    ], SKIP),
+    '1277': ([
+        ((('path', '{layerstack}'),), 'tttt'),
+        ((('path', 'intel77custom.scs'),), ''),
+    ], SKIP),
+}
+
+
+def compile_rules(process: str, values: dict):
+    """
+    Args
+    -----
+    process: kit process
+    values: values of the pattern placeholders
+
+    Returns
+    -------
+    (rules with compiled patterns, default section), None for an unknown process
+    """
+    table = MODEL_RULES.get(process)
+    if table is None:
+        return None
+    rules, default = table
+    try:
+        compiled = [(tuple((FIELDS[field], re.compile(pattern.format(**values))) for field, pattern in conditions),
+                     section) for conditions, section in rules]
+    except KeyError as error:
+        raise Exception(f"Missing {error} value for the model rules of process {process}") from error
+    return compiled, default
+
+
+def resolve_model_includes(components, process: str, values: dict) -> list:
+    """
+    Args
+    -----
+    components: (path, path components) pairs of the kit model files
+    process: kit process
+    values: values of the pattern placeholders
+
+    Returns
+    -------
+    ocean model file entries of the included files
+    """
+    table = compile_rules(process, values)
+    if table is None:
+        return []
+    rules, default = table
+    modelfiles_data = []
+    for file, parts in components:
+        section = default
+        for conditions, rule_section in rules:
+            if all(pattern.search(file if idx is None else parts[idx]) for idx, pattern in conditions):
+                section = rule_section
+                break
+        if section is not SKIP:
+            modelfiles_data.append(f"    '(\"{file}\" \"{section}\")\n")
+    return modelfiles_data
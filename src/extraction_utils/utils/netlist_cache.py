@@ -0,0 +1,147 @@
+"""Module to reuse spectre schematic netlists while their sources are unchanged"""
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+from .prelay_cache import fingerprint
+
+DERIVED_FILES = ('netlist_prelay', 'netlist_polo')
+
+
+def read_cds_lib(cds_lib, libraries=None, contents=None, seen=None) -> tuple:
+    """
+    Args
+    -----
+    path of a cds.lib file
+
+    Returns
+    -------
+    dict of library name to library directory and the list of the contents of
+    the cds.lib and of the files it includes, in include order
+    """
+    libraries = {} if libraries is None else libraries
+    contents = [] if contents is None else contents
+    seen = set() if seen is None else seen
+    cds_lib = os.path.abspath(os.path.expandvars(str(cds_lib)))
+    if cds_lib in seen:
+        return libraries, contents
+    seen.add(cds_lib)
+    with open(cds_lib, 'r', encoding='utf8', errors='replace') as cds_file:
+        text = cds_file.read()
+    contents.append(text)
+    base_dir = os.path.dirname(cds_lib)
+    for line in text.splitlines():
+        words = line.split('#')[0].split('--')[0].split()
+        if not words:
+            continue
+        statement = words[0].upper()
+        if statement in ('DEFINE', 'SOFTDEFINE') and len(words) > 2:
+            if statement == 'DEFINE' or words[1] not in libraries:
+                libraries[words[1]] = os.path.join(base_dir, os.path.expandvars(words[2]))
+        elif statement == 'UNDEFINE' and len(words) > 1:
+            libraries.pop(words[1], None)
+        elif statement in ('INCLUDE', 'SOFTINCLUDE') and len(words) > 1:
+            include = os.path.join(base_dir, os.path.expandvars(words[1]))
+            if statement == 'SOFTINCLUDE' and not os.path.exists(include):
+                continue
+            read_cds_lib(include, libraries, contents, seen)
+    return libraries, contents
+
+
+def schematic_stamps(lib_path) -> list:
+    """Returns [cell/view/file, modification time] of the oa files of the
+    schematic views of a library, None when the library cannot be read"""
+    if not os.path.isdir(lib_path):
+        return None
+    stamps = []
+    try:
+        with os.scandir(lib_path) as cells:
+            for cell in sorted(cells, key=lambda entry: entry.name):
+                schematic = os.path.join(cell.path, 'schematic')
+                if not cell.is_dir() or not os.path.isdir(schematic):
+                    continue
+                with os.scandir(schematic) as files:
+                    stamps.extend([f'{cell.name}/schematic/{file.name}', file.stat().st_mtime_ns]
+                                  for file in sorted(files, key=lambda entry: entry.name)
+                                  if file.name.endswith('.oa'))
+    except OSError:
+        return None
+    return stamps
+
+
+class NetlistCache:
+    """Spectre netlist directories addressed by the library, the cell, the
+    cds.lib contents and the schematic oa timestamps of every library defined
+    in the cds.lib they were generated from.
+    Entries are kept in cache_dir, in a directory removed at exit when no
+    cache_dir is given"""
+
+    _tmp_dir = None
+
+    def __init__(self, cache_dir=None):
+        if not cache_dir:
+            if NetlistCache._tmp_dir is None:
+                NetlistCache._tmp_dir = tempfile.mkdtemp(prefix='netlist_cache_')
+                atexit.register(shutil.rmtree, NetlistCache._tmp_dir, ignore_errors=True)
+            cache_dir = NetlistCache._tmp_dir
+        self.cache_dir = str(cache_dir)
+
+    @staticmethod
+    def key(lib_name: str, cell_name: str, cds_lib, **inputs):
+        """
+        Args
+        -----
+        lib_name, cell_name: schematic netlisted
+        cds_lib: cds.lib file of the run
+        inputs: other json serializable netlisting inputs
+
+        Returns
+        -------
+        fingerprint of the netlist sources, None when the library of the cell
+        cannot be found in cds_lib and the schematic cannot be checked. The
+        schematics of all libraries of cds_lib are stamped, as the cell may
+        instantiate cells of any of them
+        """
+        if not cds_lib or not os.path.exists(str(cds_lib)):
+            return None
+        libraries, contents = read_cds_lib(cds_lib)
+        lib_path = libraries.get(lib_name)
+        if lib_path is None or not os.path.isdir(os.path.join(lib_path, cell_name, 'schematic')):
+            logging.info("Schematic of %s/%s not found through %s, netlist is not cached",
+                         lib_name, cell_name, cds_lib)
+            return None
+        schematics = {name: schematic_stamps(path) for name, path in sorted(libraries.items())}
+        return fingerprint(lib=lib_name, cell=cell_name, cds_lib=contents,
+                           schematic=schematics, **inputs)
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'netlist_{key}')
+
+    def materialize(self, key: str, netlist_dir) -> bool:
+        """Copies the cached netlist directory of a fingerprint to netlist_dir,
+        returns False when there is none"""
+        entry = self._entry(key)
+        if not os.path.isfile(os.path.join(entry, 'netlist')):
+            return False
+        if os.path.exists(netlist_dir):
+            shutil.rmtree(netlist_dir)
+        os.makedirs(os.path.dirname(str(netlist_dir)), exist_ok=True)
+        shutil.copytree(entry, netlist_dir)
+        return True
+
+    def store(self, key: str, netlist_dir):
+        """Keeps a copy of a generated netlist directory"""
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        tmp_entry = f'{entry}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            shutil.copytree(netlist_dir, tmp_entry, ignore=shutil.ignore_patterns(*DERIVED_FILES))
+            os.rename(tmp_entry, entry)
+        except OSError as error:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            if not os.path.exists(entry):
+                logging.warning("Could not write netlist cache %s: %s", entry, error)
+
@@ -0,0 +1,86 @@
+"""Module to stage oa libraries into run directories without copying file data"""
+import fcntl
+import fnmatch
+import logging
+import os
+import shutil
+
+FICLONE = 0x40049409
+STAGE_MODES = ('auto', 'reflink', 'hardlink', 'symlink', 'copy')
+COPY_UP_PATTERNS = ('data.dm', 'prop.xx', '*.cdslck*')
+
+
+def reflink(src, dst):
+    """Creates dst as a copy on write clone of src, raises OSError when the
+    filesystem does not support cloning"""
+    try:
+        with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+    except OSError:
+        if os.path.lexists(dst):
+            os.remove(dst)
+        raise
+    shutil.copystat(src, dst)
+
+
+def symlink(src, dst):
+    """Creates dst as a symbolic link to src"""
+    os.symlink(os.path.abspath(src), dst)
+
+
+COPY_FUNCTIONS = {'reflink': reflink, 'hardlink': os.link, 'symlink': symlink,
+                  'copy': shutil.copy2}
+AUTO_ORDER = ('reflink', 'copy')
+
+
+def stage_tree(src, dst, mode: str = 'auto', writable=()) -> str:
+    """
+    Args
+    -----
+    src: oa library directory
+    dst: staged library directory, must not exist
+    mode: reflink for copy on write clones, copy for a plain copy, auto to
+        clone where the filesystem supports it and copy otherwise. hardlink
+        and symlink share the files of src, except the files the tool writes
+    writable: cell/view directories relative to src opened by the tool, their
+        files and the files matching COPY_UP_PATTERNS are copied up front in
+        the hardlink and symlink modes, so writes never reach src
+
+    Returns
+    -------
+    mode the files were staged with. Directories are always created so tools
+    can add lock and view files
+    """
+    if mode not in STAGE_MODES:
+        raise Exception(f"oa stage mode should be one of {', '.join(STAGE_MODES)}")
+    if mode in ('hardlink', 'symlink'):
+        written_dirs = tuple(os.path.join(src, path) + os.sep for path in writable)
+        link = COPY_FUNCTIONS[mode]
+
+        def stage_linked(src_file, dst_file):
+            name = os.path.basename(src_file)
+            if src_file.startswith(written_dirs) or \
+                    any(fnmatch.fnmatch(name, pattern) for pattern in COPY_UP_PATTERNS):
+                return shutil.copy2(src_file, dst_file)
+            return link(src_file, dst_file)
+
+        shutil.copytree(src, dst, copy_function=stage_linked)
+        return mode
+    if mode != 'auto':
+        shutil.copytree(src, dst, copy_function=COPY_FUNCTIONS[mode])
+        return mode
+
+    methods = list(AUTO_ORDER)
+
+    def stage_file(src_file, dst_file):
+        while len(methods) > 1:
+            try:
+                return COPY_FUNCTIONS[methods[0]](src_file, dst_file)
+            except OSError as error:
+                logging.info("Cannot %s %s, falling back to %s: %s", methods[0], src_file,
+                             methods[1], error)
+                methods.pop(0)
+        return COPY_FUNCTIONS[methods[0]](src_file, dst_file)
+
+    shutil.copytree(src, dst, copy_function=stage_file)
+    return methods[0]
@@ -0,0 +1,284 @@
+"""Module to replay ocean scripts in persistent ocean sessions"""
+import atexit
+import errno
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from waldo.util import template
+from waldo.tool.ocean import Ocean
+
+EXIT_CALL = 'exit()'
+POOL_EXIT_CALL = 'oceanPoolExit()'
+SERVER_TEMPLATE = str(Path(__file__).parent / 'templates' / 'ocn' / 'ocean_server.ocn.j2')
+POLL_INTERVAL = 0.1
+
+
+class PipeOceanSession:
+    """Ocean session started once through waldo, serving the ocean scripts
+    written to its request pipe. Standard output and exit status of every
+    script are returned through <script>.stdout and <script>.status, the part
+    of the session log written while a script ran is copied to <script>.log"""
+
+    def __init__(self, kit, session_dir=None, start_timeout: float = 600):
+        """
+        Args
+        -----
+        kit: waldo kit the session is started for
+        session_dir: directory receiving the session directory, system temp dir by default
+        start_timeout: seconds to wait for the session to serve requests
+        """
+        if session_dir:
+            os.makedirs(session_dir, exist_ok=True)
+        self.session_dir = tempfile.mkdtemp(prefix='ocean_session_', dir=session_dir)
+        self.request_pipe = os.path.join(self.session_dir, 'requests')
+        self.log_file = os.path.join(self.session_dir, 'ocean_server.log')
+        os.mkfifo(self.request_pipe)
+        server_script = os.path.join(self.session_dir, 'ocean_server.ocn')
+        _, undefined = template.generate(src_file=SERVER_TEMPLATE, dst_file=server_script,
+                                         values={'request_pipe': self.request_pipe})
+        if len(undefined) != 0:
+            raise RuntimeError(f'Undefined variables while setting up options: {str(undefined)}')
+        self.tool = Ocean(kit=kit,
+                          cmd='ocean',
+                          options=f"-noxshm -log {self.log_file} -replay {server_script}",
+                          run_dir=self.session_dir)
+        self.result = None
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._requests = self._open_requests(start_timeout)
+        logging.info("Started ocean session in %s", self.session_dir)
+
+    def _serve(self):
+        try:
+            self.result = self.tool.run()
+        except Exception as error:
+            logging.exception("Error while running ocean session: %s", error)
+            self.result = (1, '', '')
+
+    @property
+    def alive(self) -> bool:
+        """True while the ocean session runs"""
+        return self._thread.is_alive()
+
+    def _open_requests(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(self.request_pipe, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as error:
+                if error.errno != errno.ENXIO:
+                    raise error
+            if not self.alive or time.monotonic() > deadline:
+                self.close()
+                raise Exception(f"Ocean session in {self.session_dir} did not start")
+            time.sleep(POLL_INTERVAL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+        return os.fdopen(fd, 'w', encoding='utf8')
+
+    def replay(self, script) -> tuple:
+        """
+        Args
+        -----
+        path of an ocean script ending with oceanPoolExit()
+
+        Returns
+        -------
+        exit status and standard output of the script
+        """
+        script = str(Path(script).absolute())
+        status_file = f'{script}.status'
+        stdout_file = f'{script}.stdout'
+        for file in (status_file, stdout_file):
+            if os.path.exists(file):
+                os.remove(file)
+        log_start = self._log_size()
+        try:
+            status = self._request(script, status_file)
+        finally:
+            self._copy_log(log_start, f'{script}.log')
+        with open(stdout_file, 'r', encoding='utf8') as file:
+            stdout = file.read()
+        return status, stdout
+
+    def _request(self, script: str, status_file: str) -> int:
+        try:
+            self._requests.write(f'{script}\n')
+            self._requests.flush()
+        except (OSError, ValueError) as error:
+            raise Exception(f"Ocean session in {self.session_dir} is not serving: {error}") from error
+        while True:
+            if os.path.exists(status_file):
+                with open(status_file, 'r', encoding='utf8') as file:
+                    text = file.read()
+                if text.endswith('\n'):
+                    return int(text)
+            if not self.alive:
+                raise Exception(f"Ocean session in {self.session_dir} exited while replaying {script}")
+            time.sleep(POLL_INTERVAL)
+
+    def _log_size(self) -> int:
+        try:
+            return os.path.getsize(self.log_file)
+        except OSError:
+            return 0
+
+    def _copy_log(self, start: int, script_log: str):
+        """Copies the session log written from offset start on to script_log"""
+        try:
+            with open(self.log_file, 'rb') as log, open(script_log, 'wb') as file:
+                log.seek(start)
+                shutil.copyfileobj(log, file)
+        except OSError as error:
+            logging.warning("Could not write ocean log %s: %s", script_log, error)
+
+    def close(self, keep_dir: bool = False):
+        """Ends the ocean session, the session directory is removed unless
+        keep_dir is set"""
+        requests, self._requests = getattr(self, '_requests', None), None
+        if requests is not None:
+            try:
+                requests.write('quit\n')
+                requests.close()
+            except (OSError, ValueError):
+                pass
+        self._thread.join(timeout=60)
+        if keep_dir:
+            logging.warning("Ocean session directory kept in %s", self.session_dir)
+        else:
+            shutil.rmtree(self.session_dir, ignore_errors=True)
+
+
+class StubOceanSession:
+    """Session replaying scripts through a python handler instead of ocean,
+    lets the pool be used without the tools. The default handler only records
+    the replayed scripts and succeeds"""
+
+    def __init__(self, kit=None, session_dir=None, handler=None):
+        self.kit = kit
+        self.session_dir = session_dir
+        self.handler = handler
+        self.replays = []
+        self.alive = True
+
+    def replay(self, script) -> tuple:
+        """Returns the exit status and standard output of the handler"""
+        self.replays.append(str(script))
+        if self.handler is None:
+            return 0, ''
+        return self.handler(script)
+
+    def close(self, keep_dir: bool = False):
+        """Ends the session"""
+        self.alive = False
+
+
+BACKENDS = {'ocean': PipeOceanSession, 'stub': StubOceanSession}
+
+
+class OceanPool:
+    """Pool of warm ocean sessions per kit. A replay takes an idle session of
+    its kit or starts a new one while fewer than size sessions exist, and waits
+    for an idle session otherwise. A session failing a replay is ended and its
+    directory kept for debugging"""
+
+    def __init__(self, size: int = 1, backend: str = 'ocean', **session_args):
+        """
+        Args
+        -----
+        size: maximum number of sessions per kit
+        backend: ocean or stub
+        session_args: arguments of the sessions
+        """
+        if backend not in BACKENDS:
+            raise Exception(f"Invalid ocean pool backend: {backend}")
+        self.size = max(1, int(size))
+        self.session_class = BACKENDS[backend]
+        self.session_args = session_args
+        self._idle = defaultdict(list)
+        self._count = defaultdict(int)
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def kit_key(kit) -> tuple:
+        """Returns the key of the sessions of a kit"""
+        return str(kit.root), getattr(kit, 'name', None), getattr(kit, 'tech_id', None)
+
+    def _acquire(self, kit):
+        key = self.kit_key(kit)
+        with self._cond:
+            while True:
+                while self._idle[key]:
+                    session = self._idle[key].pop()
+                    if session.alive:
+                        return session
+                    self._count[key] -= 1
+                if self._count[key] < self.size:
+                    self._count[key] += 1
+                    break
+                self._cond.wait()
+        try:
+            return self.session_class(kit, **self.session_args)
+        except Exception:
+            self._discard(key)
+            raise
+
+    def _discard(self, key):
+        with self._cond:
+            self._count[key] -= 1
+            self._cond.notify()
+
+    def replay(self, kit, script) -> tuple:
+        """
+        Args
+        -----
+        kit: waldo kit of the simulation
+        script: path of the ocean script
+
+        Returns
+        -------
+        exit status and standard output of the script
+        """
+        session = self._acquire(kit)
+        key = self.kit_key(kit)
+        try:
+            result = session.replay(script)
+        except Exception:
+            session.close(keep_dir=True)
+            self._discard(key)
+            raise
+        with self._cond:
+            self._idle[key].append(session)
+            self._cond.notify()
+        return result
+
+    def close(self):
+        """Ends the idle sessions"""
+        with self._cond:
+            sessions = [session for idle in self._idle.values() for session in idle]
+            self._idle.clear()
+            self._count.clear()
+        for session in sessions:
+            session.close()
+
+
+_pools = {}
+
+
+def get_pool(size: int = 1, backend: str = 'ocean', session_dir=None) -> OceanPool:
+    """Returns the pool of the process for a size, backend and session
+    directory, sessions are reused by every simulation of the process and
+    ended at exit. Sessions run in session_dir, ocean side files such as
+    CDS.log land there instead of in the run directory of a simulation"""
+    key = (max(1, int(size)), backend, session_dir)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = OceanPool(size, backend, session_dir=session_dir)
+        atexit.register(pool.close)
+    return pool
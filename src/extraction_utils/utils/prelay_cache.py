@@ -0,0 +1,77 @@
+"""Module to reuse prelayout simulation results between the extraction views of a cell"""
+import hashlib
+import json
+import logging
+import os
+
+CACHE_VERSION = 1
+
+
+def file_digest(file_path) -> str:
+    """Returns the sha256 digest of the content of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def netlist_digest(file_path) -> str:
+    """Returns the sha256 digest of a spectre netlist without its comment
+    lines, so netlists differing only in their generation header match"""
+    digest = hashlib.sha256()
+    with open(file_path, 'r', encoding='utf8', errors='replace') as file:
+        for line in file:
+            if not line.lstrip().startswith('//'):
+                digest.update(line.encode('utf8'))
+    return digest.hexdigest()
+
+
+def fingerprint(**inputs) -> str:
+    """Returns the content address of the json serializable simulation inputs"""
+    text = json.dumps({'version': CACHE_VERSION, **inputs}, sort_keys=True)
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+class PrelayCache:
+    """Prelayout simulation results addressed by the fingerprint of their
+    inputs. A result holds the exit code, the standard output and the lines the
+    simulation appended to the .out file. Results are kept for the lifetime of
+    the process and saved to <cache_dir>/prelay_<fingerprint>.json when
+    cache_dir is given"""
+
+    _memo = {}
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = str(cache_dir) if cache_dir else None
+
+    def _cache_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'prelay_{key}.json')
+
+    def get(self, key: str):
+        """Returns the result stored for a fingerprint, None if there is none"""
+        result = self._memo.get(key)
+        if result is None and self.cache_dir:
+            try:
+                with open(self._cache_file(key), 'r', encoding='utf8') as cache_file:
+                    result = json.load(cache_file)
+            except (OSError, ValueError):
+                return None
+            self._memo[key] = result
+        return result
+
+    def put(self, key: str, exitcode: int, stdout: str, out: str):
+        """Stores the result of a prelayout simulation"""
+        result = {'exitcode': exitcode, 'stdout': stdout, 'out': out}
+        self._memo[key] = result
+        if not self.cache_dir:
+            return
+        cache_file = self._cache_file(key)
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf8') as file:
+                json.dump(result, file)
+            os.replace(tmp_file, cache_file)
+        except OSError as error:
+            logging.warning("Could not write prelayout result %s: %s", cache_file, error)
@@ -0,0 +1,72 @@
+"""Module to list the primitive devices of kit libraries through a persisted cache"""
+import json
+import logging
+import os
+import re
+
+DEVICE_PATTERN = re.compile(r'[n/p][hp]')
+CACHE_FILE = 'prim_devices.json'
+
+
+def scan_devices(dev_path) -> list:
+    """Returns the device cell directories of a primitive library directory"""
+    with os.scandir(dev_path) as entries:
+        return [entry.name for entry in entries
+                if entry.is_dir() and re.match(DEVICE_PATTERN, entry.name)]
+
+
+class PrimDeviceCache:
+    """Device lists of primitive library directories validated by the
+    modification time of the directory. Lists are kept for the lifetime of the
+    process and saved to <cache_dir>/prim_devices.json when cache_dir is given"""
+
+    _memo = {}
+
+    def __init__(self, cache_dir=None):
+        self.cache_file = os.path.join(str(cache_dir), CACHE_FILE) if cache_dir else None
+
+    def _load(self) -> dict:
+        if self.cache_file is None:
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf8') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, dev_path, entry: dict):
+        if self.cache_file is None:
+            return
+        data = self._load()
+        data[dev_path] = entry
+        tmp_file = f'{self.cache_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='utf8') as cache_file:
+                json.dump(data, cache_file)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as error:
+            logging.warning("Could not write device list cache %s: %s", self.cache_file, error)
+
+    def devices(self, dev_path) -> list:
+        """
+        Args
+        -----
+        primitive library directory of a kit
+
+        Returns
+        -------
+        device cell names of the library, the directory is only listed again
+        when its modification time changed
+        """
+        dev_path = os.path.abspath(str(dev_path))
+        mtime_ns = os.stat(dev_path).st_mtime_ns
+        entry = self._memo.get(dev_path)
+        if entry is None or entry['mtime_ns'] != mtime_ns:
+            entry = self._load().get(dev_path)
+        if entry is None or entry['mtime_ns'] != mtime_ns:
+            logging.info("Listing primitive devices in %s", dev_path)
+            entry = {'mtime_ns': mtime_ns, 'devices': scan_devices(dev_path)}
+            self._save(dev_path, entry)
+        self._memo[dev_path] = entry
+        return list(entry['devices'])
@@ -0,0 +1,103 @@
+"""Module to compare device property values as SPICE numbers within tolerances"""
+import re
+from collections import namedtuple
+import numpy as np
+from .spice_units import parse_spice_number
+
+Tolerance = namedtuple('Tolerance', ['rel', 'abs'])
+
+DEFAULT_TOLERANCE = Tolerance(1e-9, 0.0)
+TOLERANCE_PATTERN = re.compile(r'^\s*([\w,*]+)\s*:\s*(\w+\s*=\s*\S+(?:\s*,\s*\w+\s*=\s*\S+)*)\s*$')
+
+
+def parse_tolerances(tolerance_specs) -> dict:
+    """
+    Args
+    -----
+    list of tolerance strings or one ; separated string such as
+    w,l:rel=1e-3,abs=1p;*:rel=1e-6, * sets the tolerance of every other property
+
+    Returns
+    -------
+    dict of property name to Tolerance
+    """
+    if not tolerance_specs:
+        return {}
+    if isinstance(tolerance_specs, str):
+        tolerance_specs = tolerance_specs.split(';')
+    tolerances = {}
+    for spec in (spec for spec in tolerance_specs if spec.strip()):
+        match = TOLERANCE_PATTERN.match(spec)
+        if not match:
+            raise Exception(f"Invalid isotope tolerance: {spec}")
+        props, limits = match.groups()
+        values = dict(DEFAULT_TOLERANCE._asdict())
+        for limit in limits.split(','):
+            name, _, value = (part.strip() for part in limit.partition('='))
+            number = parse_spice_number(value)
+            if name not in values or number is None:
+                raise Exception(f"Invalid isotope tolerance: {spec}")
+            values[name] = number
+        for prop in props.split(','):
+            if prop:
+                tolerances[prop] = Tolerance(**values)
+    return tolerances
+
+
+class PropertyComparator:
+    """Compares property values, equal strings match and values that are both
+    SPICE numbers match when they are close within the relative or absolute
+    tolerance of the property, so 0.1u matches 100n"""
+
+    def __init__(self, tolerances=None):
+        self.tolerances = dict(tolerances or {})
+        self.default = self.tolerances.pop('*', DEFAULT_TOLERANCE)
+        self._verdicts = {}
+
+    def tolerance(self, prop: str) -> Tolerance:
+        """Returns the tolerance of a property"""
+        return self.tolerances.get(prop, self.default)
+
+    def equal(self, prop: str, ref_value, cur_value) -> bool:
+        """Returns True if the golden and sample values of a property match"""
+        if ref_value == cur_value:
+            return True
+        if ref_value is None or cur_value is None:
+            return False
+        key = (prop, ref_value, cur_value)
+        verdict = self._verdicts.get(key)
+        if verdict is None:
+            ref_number = parse_spice_number(ref_value)
+            cur_number = parse_spice_number(cur_value)
+            verdict = ref_number is not None and cur_number is not None and \
+                bool(self.close(prop, np.float64(ref_number), np.float64(cur_number)))
+            self._verdicts[key] = verdict
+        return verdict
+
+    def close(self, prop: str, ref_numbers, cur_numbers):
+        """Returns True where numbers are within the tolerance of the property,
+        works element wise on float arrays"""
+        tolerance = self.tolerance(prop)
+        with np.errstate(invalid='ignore'):
+            diff = np.abs(ref_numbers - cur_numbers)
+            scale = np.maximum(np.abs(ref_numbers), np.abs(cur_numbers))
+            return diff <= np.maximum(tolerance.abs, tolerance.rel * scale)
+
+    def compare_codes(self, prop: str, ref_codes: np.ndarray, cur_codes: np.ndarray,
+                      floats: np.ndarray) -> np.ndarray:
+        """
+        Args
+        -----
+        property name, golden and sample value code columns of matched pairs
+        and the float values of the string pool codes
+
+        Returns
+        -------
+        boolean array, True where the codes are equal or their numbers are
+        close. Non numeric values only match equal codes
+        """
+        equal = ref_codes == cur_codes
+        if equal.all():
+            return equal
+        floats = np.append(floats, np.nan)
+        return equal | self.close(prop, floats[ref_codes], floats[cur_codes])
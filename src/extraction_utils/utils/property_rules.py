@@ -0,0 +1,128 @@
+"""Module to check device properties against configurable rules"""
+import logging
+import operator
+import re
+from collections import OrderedDict, namedtuple
+import numpy as np
+from .spice_units import parse_spice_number
+
+PropertyRule = namedtuple('PropertyRule', ['name', 'props', 'op', 'value'])
+
+RULE_PATTERN = re.compile(r'^\s*([\w,]+)\s*(==|!=|<=|>=|<|>)\s*(\S+)\s*$')
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+             '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+ICV_DEFAULT_RULES = ('ped,pes==0.001u',)
+MAX_EXAMPLES = 10
+
+
+def parse_rule(rule_spec: str) -> PropertyRule:
+    """
+    Args
+    -----
+    rule string such as ped,pes==0.001u, a device violates the rule when any
+    of the listed properties satisfies the comparison
+
+    Returns
+    -------
+    PropertyRule
+    """
+    match = RULE_PATTERN.match(rule_spec)
+    if not match:
+        raise Exception(f"Invalid isotope property rule: {rule_spec}")
+    props, op_name, value = match.groups()
+    return PropertyRule(rule_spec.strip(), tuple(prop for prop in props.split(',') if prop),
+                        op_name, value)
+
+
+def parse_rules(rule_specs) -> list:
+    """Returns PropertyRules from a list of rule strings or one ; separated string"""
+    if not rule_specs:
+        return []
+    if isinstance(rule_specs, str):
+        rule_specs = rule_specs.split(';')
+    return [parse_rule(spec) for spec in rule_specs if spec.strip()]
+
+
+def violates(rule: PropertyRule, value: str) -> bool:
+    """Returns True if a property value violates the rule. Values are compared
+    as SPICE numbers when both sides are numeric, == and != fall back to
+    string comparison otherwise"""
+    compare = OPERATORS[rule.op]
+    number = parse_spice_number(value)
+    limit = parse_spice_number(rule.value)
+    if number is not None and limit is not None:
+        return compare(float(f'{number:.12g}'), float(f'{limit:.12g}'))
+    if rule.op in ('==', '!='):
+        return compare(value, rule.value)
+    return False
+
+
+class RuleChecker:
+    """Counts devices violating property rules, either one device at a time
+    while a device stream is consumed or column wise on a device table"""
+
+    def __init__(self, rules, exclude_list=()):
+        self.rules = [rule for rule in rules
+                      if not all(prop in exclude_list for prop in rule.props)]
+        self.violations = OrderedDict((rule.name, 0) for rule in self.rules)
+        self.examples = OrderedDict((rule.name, []) for rule in self.rules)
+        self.checked = False
+        self._verdicts = {}
+
+    @property
+    def passed(self) -> bool:
+        """True if no checked device violates a rule"""
+        return not any(self.violations.values())
+
+    def _record(self, rule: PropertyRule, dev_name):
+        self.violations[rule.name] += 1
+        if len(self.examples[rule.name]) < MAX_EXAMPLES:
+            self.examples[rule.name].append(dev_name)
+
+    def _violates(self, rule: PropertyRule, value: str) -> bool:
+        verdict = self._verdicts.get((rule.name, value))
+        if verdict is None:
+            verdict = self._verdicts[(rule.name, value)] = violates(rule, value)
+        return verdict
+
+    def check(self, dev: dict) -> bool:
+        """Checks one device dict, returns True if it violates no rule"""
+        dev_ok = True
+        for rule in self.rules:
+            if any(prop in dev and self._violates(rule, dev[prop]) for prop in rule.props):
+                self._record(rule, dev.get("PROPERTY"))
+                dev_ok = False
+        return dev_ok
+
+    def watch(self, devices):
+        """Generator checking every device of a device stream on its way through"""
+        for dev in devices:
+            self.check(dev)
+            yield dev
+        self.checked = True
+
+    def check_table(self, table):
+        """Checks every device of a device table with column operations. Rules
+        are evaluated once per distinct value of a property column"""
+        for rule in self.rules:
+            bad = np.zeros(len(table), dtype=bool)
+            for prop in rule.props:
+                column = table.column(prop)
+                codes = np.unique(column[column >= 0])
+                bad_codes = [code for code in codes if self._violates(rule, table.pool[code])]
+                if bad_codes:
+                    bad |= np.isin(column, bad_codes)
+            bad_rows = np.flatnonzero(bad)
+            self.violations[rule.name] += len(bad_rows)
+            self.examples[rule.name].extend(table.names[row] for row in bad_rows[:MAX_EXAMPLES])
+        self.checked = True
+
+    def log_results(self, logger=logging):
+        """Logs the violation count and example devices of every rule"""
+        for rule in self.rules:
+            if self.violations[rule.name]:
+                logger.error("%d device(s) violate property rule %s, e.g. %s",
+                             self.violations[rule.name], rule.name,
+                             ' '.join(str(name) for name in self.examples[rule.name]))
+            else:
+                logger.info("Property rule %s passed", rule.name)
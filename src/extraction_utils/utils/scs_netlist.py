@@ -0,0 +1,112 @@
+"""Module to read spectre netlists generated from oa views"""
+import re
+from collections import OrderedDict, namedtuple
+
+
+def iter_logical_lines(scs_file):
+    """
+    Args
+    -----
+    spectre netlist file
+
+    Returns
+    -------
+    yields the logical lines of the netlist, a line ending with a backslash is
+    joined with the line following it without holding the file in memory
+    """
+    parts = []
+    with open(scs_file, 'r', encoding='utf8') as file:
+        for line in file:
+            if line.endswith('\\\n'):
+                parts.append(line[:-2])
+                continue
+            if parts:
+                parts.append(line)
+                line = ''.join(parts)
+                parts = []
+            yield line
+    if parts:
+        yield ''.join(parts)
+
+
+SpectreInstance = namedtuple('SpectreInstance', ['name', 'terminals', 'model', 'params'])
+
+TOKEN = re.compile(r'"[^"]*"|[()=]|[^\s()="]+')
+KEYWORDS = frozenset(('simulator', 'subckt', 'inline', 'ends', 'parameters', 'include',
+                      'ahdl_include', 'library', 'endlibrary', 'section', 'endsection',
+                      'model', 'global', 'save', 'options', 'statistics', 'real', 'export'))
+
+
+def parse_instance(line: str):
+    """
+    Args
+    -----
+    logical line of a spectre netlist
+
+    Returns
+    -------
+    SpectreInstance with instance name, terminals, model and an ordered map of
+    parameters, None if the line is not an instance statement. Parameter values
+    keep their netlist text, parenthesized expressions included
+    """
+    tokens = [(match.group(), match.start(), match.end()) for match in TOKEN.finditer(line)]
+    if len(tokens) < 2 or tokens[0][0] in KEYWORDS or tokens[0][0].startswith(('//', '*')):
+        return None
+    pos = 1
+    if tokens[1][0] == '(':
+        close = next((idx for idx in range(2, len(tokens)) if tokens[idx][0] == ')'), None)
+        if close is None or close + 1 >= len(tokens):
+            return None
+        terminals = [token[0] for token in tokens[2:close]]
+        pos = close + 1
+    else:
+        pos = next((idx - 2 for idx in range(len(tokens)) if tokens[idx][0] == '='),
+                   len(tokens) - 1)
+        if pos < 1:
+            return None
+        terminals = [token[0] for token in tokens[1:pos]]
+    model = tokens[pos][0]
+    if model in ('(', ')', '=') or (pos + 1 < len(tokens) and tokens[pos + 1][0] == '='):
+        return None
+    params = OrderedDict()
+    pos += 1
+    while pos < len(tokens) and not tokens[pos][0].startswith('//'):
+        if pos + 2 >= len(tokens) or tokens[pos + 1][0] != '=':
+            pos += 1
+            continue
+        end = pos + 2
+        depth = 0
+        while True:
+            depth += {'(': 1, ')': -1}.get(tokens[end][0], 0)
+            if depth <= 0 or end + 1 == len(tokens):
+                break
+            end += 1
+        params[tokens[pos][0]] = line[tokens[pos + 2][1]:tokens[end][2]]
+        pos = end + 1
+    return SpectreInstance(tokens[0][0], terminals, model, params)
+
+
+def iter_instances(lines):
+    """
+    Args
+    -----
+    iterable of logical netlist lines
+
+    Returns
+    -------
+    yields a SpectreInstance for every instance statement
+    """
+    for line in lines:
+        instance = parse_instance(line)
+        if instance is not None:
+            yield instance
+
+
+def instance_device(instance: SpectreInstance) -> dict:
+    """Returns the device dict of an instance in the layout used for spf devices,
+    name, model and number of terminals followed by the parameters"""
+    dev_data = {"PROPERTY": instance.name,
+                "device_type": instance.model,
+                "num_of_ports": str(len(instance.terminals))}
+    dev_data.update(instance.params)
+    return dev_data
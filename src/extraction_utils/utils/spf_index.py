@@ -0,0 +1,158 @@
+"""Module to locate the sections of spf files through a persisted offset index"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.idx'
+INSTANCE_SECTION = b"Instance Section"
+SUBCKT = b".SUBCKT"
+NET = b"\n*|NET"
+HASH_BLOCK = 16 * 1024 * 1024
+
+
+class SpfIndex:
+    """Byte offsets of the header, .SUBCKT lines, net section and instance
+    section of an spf file. Offsets are found with one mmap scan and saved in
+    a sidecar index file, later readers seek straight to the region they need.
+    Indexes are kept for the lifetime of the process, so an spf file in a read
+    only directory is scanned once per process"""
+
+    _memo = {}
+
+    def __init__(self, spf_file, index_file=None, index_dir=None):
+        """Loads the sidecar index of the spf file, scanning the spf file and
+        writing the sidecar when it is missing or stale
+
+        Args
+        -----
+        spf_file: path of spf file
+        index_file: path of sidecar index file, <spf_file>.idx by default
+        index_dir: directory holding the index instead when the sidecar cannot
+            be written, such as for spf files in read only directories
+        """
+        self.spf_file = str(spf_file)
+        self.index_file = str(index_file) if index_file else self.spf_file + INDEX_SUFFIX
+        self.index_files = [self.index_file]
+        if index_dir:
+            path_digest = hashlib.blake2b(os.path.abspath(self.spf_file).encode('utf8'),
+                                          digest_size=8).hexdigest()
+            self.index_files.append(os.path.join(
+                str(index_dir), f'{os.path.basename(self.spf_file)}.{path_digest}{INDEX_SUFFIX}'))
+        stat = os.stat(self.spf_file)
+        self.stamp = {'version': INDEX_VERSION, 'size': stat.st_size,
+                      'mtime_ns': stat.st_mtime_ns}
+        self.key = (os.path.abspath(self.spf_file), stat.st_size, stat.st_mtime_ns)
+        entry = self._memo.get(self.key)
+        if entry is None:
+            entry = self._load()
+            if entry is None:
+                entry = {'offsets': self.scan(), 'digests': {}}
+                self.offsets, self.digests = entry['offsets'], entry['digests']
+                self._save()
+            self._memo[self.key] = entry
+        self.offsets, self.digests = entry['offsets'], entry['digests']
+
+    def _load(self):
+        for index_file in self.index_files:
+            try:
+                with open(index_file, 'r', encoding='utf8') as idx_file:
+                    data = json.load(idx_file)
+            except (OSError, ValueError):
+                continue
+            if data.get('stamp') != self.stamp:
+                logging.info("Index %s is stale, rescanning %s", index_file, self.spf_file)
+                continue
+            self.index_file = index_file
+            return {'offsets': data.get('offsets'), 'digests': data.get('digests', {})}
+        return None
+
+    def _save(self):
+        errors = []
+        for index_file in [self.index_file] + [file for file in self.index_files
+                                               if file != self.index_file]:
+            tmp_file = f'{index_file}.{os.getpid()}.tmp'
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(index_file)), exist_ok=True)
+                with open(tmp_file, 'w', encoding='utf8') as idx_file:
+                    json.dump({'stamp': self.stamp, 'offsets': self.offsets,
+                               'digests': self.digests}, idx_file)
+                os.replace(tmp_file, index_file)
+                self.index_file = index_file
+                return
+            except OSError as error:
+                errors.append(f'{index_file}: {error}')
+        logging.warning("Could not write spf index of %s: %s", self.spf_file, '; '.join(errors))
+
+    def scan(self) -> dict:
+        """Returns the section offsets found by scanning the spf file"""
+        size = self.stamp['size']
+        offsets = {'header': [0, size], 'subckt': [], 'nets': None, 'instance': None}
+        if size == 0:
+            return offsets
+        with open(self.spf_file, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as spf_map:
+                pos = spf_map.find(SUBCKT)
+                while pos != -1:
+                    start = spf_map.rfind(b'\n', 0, pos) + 1
+                    end = spf_map.find(b'\n', pos)
+                    end = size if end == -1 else end + 1
+                    offsets['subckt'].append([start, end])
+                    pos = spf_map.find(SUBCKT, end)
+                marker = spf_map.find(INSTANCE_SECTION)
+                marker_start = size
+                if marker != -1:
+                    marker_start = spf_map.rfind(b'\n', 0, marker) + 1
+                    end = spf_map.find(b'\n', marker)
+                    offsets['instance'] = [size if end == -1 else end + 1, size]
+                net = spf_map.find(NET, 0, marker_start)
+                if net != -1:
+                    offsets['nets'] = [net + 1, marker_start]
+        if offsets['subckt']:
+            offsets['header'] = [0, offsets['subckt'][0][0]]
+        return offsets
+
+    def read_region(self, region) -> bytes:
+        """Returns the bytes of a [start, end] region of the spf file"""
+        if not region:
+            return b''
+        start, end = region
+        with open(self.spf_file, 'rb') as file:
+            file.seek(start)
+            return file.read(end - start)
+
+    @property
+    def instance_offset(self):
+        """Byte offset of the line following the instance section marker, None
+        if the spf file has no instance section"""
+        return self.offsets['instance'][0] if self.offsets['instance'] else None
+
+    def region_hash(self, region) -> str:
+        """Returns the blake2b digest of a [start, end] region of the spf file"""
+        digest = hashlib.blake2b(digest_size=20)
+        if region:
+            start, end = region
+            with open(self.spf_file, 'rb') as file:
+                file.seek(start)
+                while start < end:
+                    block = file.read(min(HASH_BLOCK, end - start))
+                    if not block:
+                        break
+                    digest.update(block)
+                    start += len(block)
+        return digest.hexdigest()
+
+    @property
+    def instance_hash(self) -> str:
+        """Digest of the instance section, computed once and kept in the
+        sidecar index file"""
+        if 'instance' not in self.digests:
+            self.digests['instance'] = self.region_hash(self.offsets['instance'])
+            self._save()
+        return self.digests['instance']
+
+    def subckt_lines(self) -> list:
+        """Returns the .SUBCKT lines of the spf file"""
+        return [self.read_region(region).decode('utf8') for region in self.offsets['subckt']]
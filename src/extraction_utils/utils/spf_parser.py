@@ -0,0 +1,184 @@
+"""Module to parse the instance section of spf files one device at a time"""
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from .spf_index import SpfIndex
+
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+CHUNKS_PER_WORKER = 4
+
+
+def parse_device_line(line: str):
+    """
+    Args
+    -----
+    device line from spf instance section or oa view file
+
+    Returns
+    -------
+    dict with device name, device type, number of ports and properties of the
+    device, None if the line does not describe a device
+    """
+    tokens = line.split()
+    if len(tokens) <= 2:
+        return None
+    for counter, token in enumerate(tokens):
+        if "=" in token:
+            break
+    else:
+        return None
+    dev_data = {"PROPERTY": tokens[0],
+                "device_type": tokens[counter - 1],
+                "num_of_ports": str(counter - 2)}
+    for token in tokens[counter:]:
+        name, sep, value = token.partition("=")
+        if sep:
+            dev_data[name] = value
+    return dev_data
+
+
+def iter_instance_lines(spf_file):
+    """
+    Args
+    -----
+    spf file
+
+    Returns
+    -------
+    yields lines following the instance section marker of the spf file
+    """
+    start = find_instance_offset(spf_file)
+    if start is None:
+        return
+    with open(spf_file, "rb") as raw_file:
+        raw_file.seek(start)
+        with io.TextIOWrapper(raw_file, encoding='utf8') as file:
+            for line in file:
+                yield line
+
+
+def iter_devices(lines):
+    """
+    Args
+    -----
+    iterable of device lines
+
+    Returns
+    -------
+    yields device dicts for the lines describing a device
+    """
+    for line in lines:
+        dev_data = parse_device_line(line)
+        if dev_data is not None:
+            yield dev_data
+
+
+def iter_spf_devices(spf_file):
+    """
+    Args
+    -----
+    spf file
+
+    Returns
+    -------
+    yields device dicts from instance section of the spf file without holding
+    the file contents in memory
+    """
+    return iter_devices(iter_instance_lines(spf_file))
+
+
+def find_instance_offset(spf_file):
+    """
+    Args
+    -----
+    spf file
+
+    Returns
+    -------
+    byte offset of the line following the instance section marker, None if the
+    spf file has no instance section. The offset is read from the spf index
+    sidecar file when it is up to date
+    """
+    return SpfIndex(spf_file).instance_offset
+
+
+def split_byte_ranges(spf_file, start: int, end: int, num_chunks: int) -> list:
+    """
+    Args
+    -----
+    spf file, byte range to split and number of chunks wanted
+
+    Returns
+    -------
+    list of (start, end) byte ranges covering the input range, every range
+    begins at the start of a line
+    """
+    chunk_size = max(1, (end - start) // max(1, num_chunks))
+    bounds = [start]
+    with open(spf_file, "rb") as file:
+        while bounds[-1] + chunk_size < end:
+            file.seek(bounds[-1] + chunk_size)
+            file.readline()
+            if file.tell() >= end:
+                break
+            bounds.append(file.tell())
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def parse_byte_range_lines(spf_file, start: int, end: int) -> list:
+    """
+    Args
+    -----
+    spf file and a line aligned byte range of its instance section
+
+    Returns
+    -------
+    list of lines in the byte range
+    """
+    with open(spf_file, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start).decode('utf8')
+    return data.splitlines()
+
+
+def parse_byte_range(spf_file, start: int, end: int) -> list:
+    """
+    Args
+    -----
+    spf file and a line aligned byte range of its instance section
+
+    Returns
+    -------
+    list of device dicts for the lines in the byte range
+    """
+    return list(iter_devices(parse_byte_range_lines(spf_file, start, end)))
+
+
+def iter_spf_device_chunks(spf_file, workers: int):
+    """
+    Args
+    -----
+    spf file and number of worker processes
+
+    Returns
+    -------
+    yields lists of device dicts from instance section of the spf file in file
+    order. At most two ranges per worker are parsed ahead of the consumer, so
+    chunks can be processed and freed while the workers go on
+    """
+    start = find_instance_offset(spf_file)
+    if start is None:
+        return
+    end = os.path.getsize(spf_file)
+    if workers <= 1 or end - start < PARALLEL_MIN_BYTES:
+        yield list(iter_spf_devices(spf_file))
+        return
+    ranges = deque(split_byte_ranges(spf_file, start, end, workers * CHUNKS_PER_WORKER))
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while ranges or pending:
+            while ranges and len(pending) < 2 * workers:
+                pending.append(executor.submit(parse_byte_range, spf_file, *ranges.popleft()))
+            yield pending.popleft().result()
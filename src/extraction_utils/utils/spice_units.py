@@ -0,0 +1,59 @@
+"""Module to convert SPICE numbers with scale suffixes to floats"""
+import math
+import re
+import numpy as np
+
+SCALE_FACTORS = {'t': 1e12, 'g': 1e9, 'meg': 1e6, 'k': 1e3, 'm': 1e-3,
+                 'u': 1e-6, 'n': 1e-9, 'p': 1e-12, 'f': 1e-15, 'a': 1e-18}
+
+SPICE_NUMBER = re.compile(r'([-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?)(meg|[tgkmunpfa])?[a-z]*$',
+                          re.IGNORECASE)
+
+
+def parse_spice_number(value):
+    """
+    Args
+    -----
+    property value such as 1.0u, 100n, 2meg or 0.5
+
+    Returns
+    -------
+    float value of the number with its scale suffix applied, None if the value
+    is not a SPICE number
+    """
+    if value is None:
+        return None
+    if '_' not in value:
+        try:
+            number = float(value)
+            if math.isfinite(number):
+                return number
+        except ValueError:
+            pass
+    match = SPICE_NUMBER.match(value.strip())
+    if not match:
+        return None
+    number, suffix = match.groups()
+    if suffix:
+        return float(number) * SCALE_FACTORS[suffix.lower()]
+    return float(number)
+
+
+def spice_floats(values) -> np.ndarray:
+    """
+    Args
+    -----
+    sequence of property values
+
+    Returns
+    -------
+    float array of the values with scale suffixes applied, NaN where a value is
+    not a SPICE number. Values are converted by parse_spice_number so table
+    and stream comparisons agree
+    """
+    floats = np.full(len(values), np.nan)
+    for idx, value in enumerate(values):
+        number = parse_spice_number(value)
+        if number is not None:
+            floats[idx] = number
+    return floats